@@ -56,32 +56,11 @@ The first step implement the Sieve of Eratosthenes algorithm for finding
 prime numbers up to a given bound n (specified by input)
 
 This helper function will be useful for generating one of the parameters used in
-the algorithm.
+the algorithm. It is shared by all the algorithms in this repository, and
+lives in prime_sieve.py (segmented, odd-only, and cached by bound).
 """
 
-def primes_up_to(n):
-    primeCheck = [True]*(n+1) #boolean array indicating if index is prime
-    primeCheck[0] = False
-    primeCheck[1] = False
-    primes = []
-    p = 2
-    
-    while p**2 < n:
-        
-        if (primeCheck[p] is True):
-            for i in range(p**2 , n+1 , p):
-                primeCheck[i] = False
-        
-        for j in range(p+1,n+1):
-            if primeCheck[j] is True:
-                p = j
-                break
-    
-    for k in range(n+1):
-        if primeCheck[k] is True:
-            primes.append(k)
-    
-    return primes
+from prime_sieve import primes_up_to , primes_between , stage1_multiplier , stage2_giant_step
 
 
 """
@@ -307,6 +286,451 @@ def elliptic_multiply(p , k , a , b , m):
     
 
 
+"""
+Choosing the multiplier K for stage 1.
+
+If the order of P over Z/pZ divides K, then KP is the point at infinity over
+Z/pZ. K = stage1_multiplier(bound) is the product of the largest power of
+each prime that is <= bound, i.e. lcm(1 , 2 , ... , bound). Pollard's p-1
+and p+1 (pollard_pm1.py) use the same K, so it lives in prime_sieve.py,
+together with stage2_giant_step.
+"""
+
+"""
+The double-and-add loop in elliptic_multiply performs one addition for every
+1 bit of k, i.e. about half of the bits. Since -P is just (x,-y), we can
+also subtract P for free. Writing k in 'non-adjacent form' (NAF), with digits
+in {-1,0,1} and no two adjacent non-zero digits, only a third of the digits
+are non-zero, which saves a third of the (expensive, affine) additions.
+
+naf(k) returns the NAF digits of k, least significant first.
+elliptic_multiply_naf has the same specifications as elliptic_multiply.
+"""
+
+def naf(k):
+    digits = []
+    while k > 0:
+        if k % 2 == 1:
+            digit = 2 - (k % 4)
+            k = k - digit
+        else:
+            digit = 0
+        digits.append(digit)
+        k = k // 2
+    return digits
+
+def elliptic_multiply_naf(p , k , a , b , m):
+    negative_p = (p[0] , (-p[1])%m)
+    result = 'Point At Infinity'
+    success , value = 1 , -1
+    
+    for digit in reversed(naf(k)):
+        success , value , result = elliptic_add(result , result , a , b , m)
+        if success == -1:
+            return success , value , result
+        
+        if digit == 1:
+            success , value , result = elliptic_add(result , p , a , b , m)
+        elif digit == -1:
+            success , value , result = elliptic_add(result , negative_p , a , b , m)
+        
+        if success == -1:
+            return success , value , result
+    
+    return success , value , result
+
+
+"""
+(Optional) Running many affine curves in lock-step
+
+Each elliptic_add pays for one modular inversion. If we run a batch of curves
+through the SAME multiplier K at the same time, every step needs one inversion
+per curve, all modulo the same n. Montgomery's simultaneous inversion trick
+replaces all of them by a single inversion:
+    
+    1. Compute the running products c0 = a0, c1 = a0*a1, ..., c_last = a0*...*a_last
+    2. Invert c_last once.
+    3. Walk backwards: 1/a_i = (1/c_i) * c_(i-1), and 1/c_(i-1) = (1/c_i) * a_i
+    
+This costs 3 multiplications per element plus a single pow(x , -1 , n).
+
+If c_last is not invertible, some a_i shares a factor with n. This is exactly
+the event we are hoping for, and we report which element (i.e. which curve)
+caused it.
+
+SPECIFICATIONS:
+
+batch_inverse(values , m) returns success , failure_index , inverses
+    1. success = 1 and inverses is the list of inverses of values mod m, or
+    2. success = -1 and failure_index is the index of the first value that is
+       not invertible mod m.
+"""
+
+def batch_inverse(values , m):
+    products = []
+    running = 1
+    for value in values:
+        running = (running * value)%m
+        products.append(running)
+    
+    try:
+        inverse = mod_inverse(running , m)
+    except ValueError:
+        for index in range(len(values)):
+            if gcd(values[index] , m) != 1:
+                return -1 , index , None
+    
+    inverses = [0]*len(values)
+    for index in range(len(values) - 1 , 0 , -1):
+        inverses[index] = (inverse * products[index - 1])%m
+        inverse = (inverse * values[index])%m
+    if values != []:
+        inverses[0] = inverse
+    
+    return 1 , -1 , inverses
+
+"""
+elliptic_add_batch(ps , qs , a_list , m) adds ps[i] + qs[i] on the curve with
+coefficient a_list[i], for every i, using one batch_inverse for all of them.
+(b is never needed to add points, and unlike elliptic_add we skip the checks
+that the points lie on the curve, since those cost a few multiplications each.)
+
+It returns 4 pieces of information: success , failure_index , failure_value , points
+    1. If some denominator is not invertible, success = -1, failure_index is
+       the curve that caused it, and failure_value is that denominator.
+    2. Otherwise success = 1 and points is the list of sums.
+
+elliptic_multiply_batch(ps , k , a_list , m) multiplies every point ps[i] by
+the same k with the NAF method, using elliptic_add_batch for every step.
+"""
+
+def elliptic_add_batch(ps , qs , a_list , m):
+    denominators = []
+    numerators = []
+    
+    for index in range(len(ps)):
+        p , q , a = ps[index] , qs[index] , a_list[index]
+        if p == 'Point At Infinity' or q == 'Point At Infinity':
+            denominators.append(1)
+            numerators.append(None)
+            continue
+        
+        x1 , y1 = p
+        x2 , y2 = q
+        if x1 != x2:
+            denominators.append((x2 - x1)%m)
+            numerators.append((y2 - y1)%m)
+        elif (y1 + y2)%m == 0:
+            #q = -p, or p is a point of order 2
+            denominators.append(1)
+            numerators.append('Point At Infinity')
+        else:
+            #this is 2*y1 when p = q. Otherwise y1**2 = y2**2 but y1 != -y2,
+            #so y1 + y2 is not invertible and will give us a factor of m
+            denominators.append((y1 + y2)%m)
+            numerators.append((3*x1*x1 + a)%m)
+    
+    success , failure_index , inverses = batch_inverse(denominators , m)
+    if success == -1:
+        return -1 , failure_index , denominators[failure_index] , None
+    
+    points = []
+    for index in range(len(ps)):
+        p , q = ps[index] , qs[index]
+        if numerators[index] is None:
+            points.append(q if p == 'Point At Infinity' else p)
+        elif numerators[index] == 'Point At Infinity':
+            points.append('Point At Infinity')
+        else:
+            lamb = (numerators[index] * inverses[index])%m
+            x1 , y1 = p
+            x3 = (lamb*lamb - x1 - q[0])%m
+            y3 = (lamb*(x1 - x3) - y1)%m
+            points.append((x3 , y3))
+    
+    return 1 , -1 , -1 , points
+
+def negate_batch(ps , m):
+    return [p if p == 'Point At Infinity' else (p[0] , (-p[1])%m) for p in ps]
+
+def elliptic_multiply_batch(ps , k , a_list , m):
+    negative_ps = negate_batch(ps , m)
+    results = ['Point At Infinity']*len(ps)
+    
+    for digit in reversed(naf(k)):
+        success , index , value , results = elliptic_add_batch(results , results , a_list , m)
+        if success == -1:
+            return success , index , value , results
+        
+        if digit == 1:
+            success , index , value , results = elliptic_add_batch(results , ps , a_list , m)
+        elif digit == -1:
+            success , index , value , results = elliptic_add_batch(results , negative_ps , a_list , m)
+        
+        if success == -1:
+            return success , index , value , results
+    
+    return 1 , -1 , -1 , results
+
+"""
+Stage 2 in lock-step: every curve walks through the same primes in (bound,B2],
+so the differences between consecutive primes are the same for every curve.
+This is affine_stage2 with every elliptic_add replaced by elliptic_add_batch.
+Returns the same 4 pieces of information as elliptic_multiply_batch.
+"""
+
+def affine_stage2_batch(ps , a_list , m , bound , B2):
+    primes = list(primes_between(bound + 1 , B2))
+    if primes == []:
+        return 1 , -1 , -1 , ps
+    
+    success , index , value , Rs = elliptic_multiply_batch(ps , primes[0] , a_list , m)
+    if success == -1:
+        return success , index , value , Rs
+    
+    differences = {}
+    for count in range(1 , len(primes)):
+        d = primes[count] - primes[count-1]
+        if d not in differences:
+            success , index , value , differences[d] = elliptic_multiply_batch(ps , d , a_list , m)
+            if success == -1:
+                return success , index , value , None
+        
+        success , index , value , Rs = elliptic_add_batch(Rs , differences[d] , a_list , m)
+        if success == -1:
+            return success , index , value , Rs
+    
+    return 1 , -1 , -1 , Rs
+
+
+"""
+(Optional) Inversion-free arithmetic on Montgomery curves
+
+Every call to elliptic_add above pays for one modular inversion. For a
+60-100 digit n these inversions are the main cost of the algorithm. Instead,
+we can work with curves in Montgomery form:
+    
+    B*y**2 = x**3 + A*x**2 + x
+    
+and only keep track of the x-coordinate of a point in projective form (X:Z),
+where x = X/Z. Points are never divided out, so no inversions are needed.
+
+    1. The 'Point At Infinity' is any point with Z = 0 (mod n).
+    
+    2. Working over Z/nZ ~= Z/pZ x Z/qZ, if kP is the point at infinity over
+       Z/pZ but not over Z/qZ, then p divides Z but q does not. So gcd(Z,n)
+       gives us a factor of n.
+       
+    3. Instead of catching ValueError at every step, we only take ONE gcd
+       at the end of the computation.
+       
+    4. The price to pay is that without y, we cannot add two arbitrary points.
+       We can only add P and Q if we also know P-Q ('differential addition').
+       This is enough to compute kP using the 'Montgomery ladder'.
+
+To generate curves we use Suyama's parametrization. Given sigma > 5, set
+    u = sigma**2 - 5 ,  v = 4*sigma
+    x0 = u**3 , z0 = v**3
+    (A+2)/4 = (v-u)**3 * (3*u+v) / (16 * u**3 * v)
+The group order of these curves is always divisible by 12, which makes them
+slightly more likely to have smooth order than a random curve.
+
+The formulas only need a24 = (A+2)/4, which we compute once per curve
+(this is the only inversion for the whole curve).
+
+SPECIFICATIONS:
+
+suyama_curve(sigma , n) returns 3 pieces of information:
+    success , failure_value , (a24 , X0 , Z0)
+in the same style as elliptic_add.
+"""
+
+def suyama_curve(sigma , n):
+    u = (sigma**2 - 5)%n
+    v = (4*sigma)%n
+    X0 = pow(u , 3 , n)
+    Z0 = pow(v , 3 , n)
+    
+    denominator = (16*X0*v)%n
+    try:
+        inverse = mod_inverse(denominator , n)
+    except ValueError:
+        #16*u**3*v is not invertible, gcd(denominator,n) may be a factor
+        return -1 , denominator , ('x' , 'x' , 'x')
+    
+    a24 = (pow(v-u , 3 , n) * (3*u + v) * inverse)%n
+    return 1 , -1 , (a24 , X0 , Z0)
+
+
+"""
+Doubling and differential addition in (X:Z) coordinates.
+
+montgomery_double(X , Z , a24 , n) returns (X:Z) of 2P, given P = (X:Z).
+
+montgomery_add(X1 , Z1 , X2 , Z2 , Xd , Zd , n) returns (X:Z) of P+Q, given
+P = (X1:Z1), Q = (X2:Z2) and their difference P-Q = (Xd:Zd).
+"""
+
+def montgomery_double(X , Z , a24 , n):
+    t1 = (X + Z)**2 % n
+    t2 = (X - Z)**2 % n
+    t3 = t1 - t2
+    return (t1*t2)%n , (t3*(t2 + a24*t3))%n
+
+def montgomery_add(X1 , Z1 , X2 , Z2 , Xd , Zd , n):
+    u = ((X1 - Z1)*(X2 + Z2))%n
+    v = ((X1 + Z1)*(X2 - Z2))%n
+    return (Zd*(u + v)**2)%n , (Xd*(u - v)**2)%n
+
+"""
+The Montgomery ladder computes kP by keeping two points R0 = mP and
+R1 = (m+1)P, whose difference is always P. Reading the bits of k from the
+most significant bit, each bit costs exactly one doubling and one
+differential addition.
+
+SPECIFICATIONS:
+
+Given a point P = (X:Z) on the curve with parameter a24 over Z/nZ, and an
+integer k >= 1, return (X:Z) of kP.
+"""
+
+def montgomery_ladder(X , Z , k , a24 , n):
+    if k == 1:
+        return X , Z
+    
+    X0 , Z0 = X , Z
+    X1 , Z1 = montgomery_double(X , Z , a24 , n)
+    
+    for bit in bin(k)[3:]:
+        if bit == '1':
+            X0 , Z0 = montgomery_add(X1 , Z1 , X0 , Z0 , X , Z , n)
+            X1 , Z1 = montgomery_double(X1 , Z1 , a24 , n)
+        else:
+            X1 , Z1 = montgomery_add(X1 , Z1 , X0 , Z0 , X , Z , n)
+            X0 , Z0 = montgomery_double(X0 , Z0 , a24 , n)
+    
+    return X0 , Z0
+
+"""
+Stage 1 on a single Suyama curve:
+    1. Build the curve from sigma.
+    2. Multiply the starting point by K = stage1_multiplier(bound) with a
+       single Montgomery ladder.
+    3. Take a single gcd(Z , n) at the end.
+
+Returns gcd(value , n) together with the final point, where value is
+either the non-invertible denominator from suyama_curve, or the final Z.
+The returned gcd may be 1 (curve failed) or n (both primes hit the
+point at infinity simultaneously), in which case another curve must be tried.
+"""
+
+def montgomery_stage1(n , bound , sigma):
+    success , value , curve = suyama_curve(sigma , n)
+    if success == -1:
+        return gcd(value , n) , curve
+    
+    a24 , X , Z = curve
+    X , Z = montgomery_ladder(X , Z , stage1_multiplier(bound) , a24 , n)
+    
+    return gcd(Z , n) , (a24 , X , Z)
+
+
+"""
+(Optional) Stage 2
+
+After stage 1 we hold the point Q = kP, where k is built from every prime
+power up to 'bound' (B1). Stage 1 fails when the order of P over Z/pZ has a
+single prime factor q just above B1. Stage 2 catches this case: for every
+prime q with B1 < q <= B2, we check whether qQ is the point at infinity.
+
+Affine coordinates ('standard continuation'):
+    1. Compute R = q1*Q for the first prime q1 > B1.
+    2. Consecutive primes differ by small even numbers d. Precompute the
+       points d*Q once, then walk R -> R + d*Q from prime to prime.
+    3. Each step is a single elliptic_add, which fails (and gives us a factor)
+       exactly when R hits the point at infinity over Z/pZ.
+
+Montgomery coordinates ('baby-step giant-step'):
+    1. Fix an even D. Every prime q in (B1,B2] can be written as q = m*D +- j
+       with 0 < j < D/2, j odd and coprime to D.
+    2. Baby steps: precompute x(jQ) for those j.
+    3. Giant steps: walk R = m*D*Q for m = 1, 2, 3, ... using differential
+       addition (the difference between consecutive giant steps is D*Q).
+    4. mDQ and jQ have the same x-coordinate exactly when (mD -+ j)Q = q*Q
+       is the point at infinity. So over Z/pZ, the cross product
+           X_R*Z_j - X_j*Z_R
+       is 0 (mod p). Multiply all of these together and take ONE gcd at the end.
+       
+Both functions return gcd(value , n), which may be 1 or n.
+"""
+
+def affine_stage2(p , a , b , n , bound , B2):
+    primes = list(primes_between(bound + 1 , B2))
+    if primes == [] or p == 'Point At Infinity':
+        return 1
+    
+    success , value , R = elliptic_multiply(p , primes[0] , a , b , n)
+    if success == -1:
+        return gcd(value , n)
+    
+    differences = {}
+    for count in range(1 , len(primes)):
+        d = primes[count] - primes[count-1]
+        if d not in differences:
+            success , value , differences[d] = elliptic_multiply(p , d , a , b , n)
+            if success == -1:
+                return gcd(value , n)
+        
+        success , value , R = elliptic_add(R , differences[d] , a , b , n)
+        if success == -1:
+            return gcd(value , n)
+    
+    return 1
+
+def montgomery_stage2(X , Z , a24 , n , bound , B2):
+    primes = list(primes_between(max(bound , 3) + 1 , B2))
+    if primes == []:
+        return 1
+    
+    D = stage2_giant_step(bound , B2)
+    
+    #baby steps: jQ for odd j < D/2, computed 2Q apart
+    X2 , Z2 = montgomery_double(X , Z , a24 , n)
+    baby_steps = {1 : (X , Z)}
+    previous , current = (X , Z) , montgomery_add(X2 , Z2 , X , Z , X , Z , n)
+    for j in range(3 , D//2 , 2):
+        if gcd(j , D) == 1:
+            baby_steps[j] = current
+        previous , current = current , montgomery_add(current[0] , current[1] , X2 , Z2 , previous[0] , previous[1] , n)
+    
+    #giant steps: R = m*D*Q, starting from the first m we need
+    XD , ZD = montgomery_ladder(X , Z , D , a24 , n)
+    m = max(1 , (primes[0] + D//2)//D)
+    R_previous = montgomery_ladder(X , Z , (m-1)*D , a24 , n) if m > 1 else (XD , ZD)
+    R = montgomery_ladder(X , Z , m*D , a24 , n)
+    
+    accumulated = 1
+    index = 0
+    while index < len(primes):
+        XR , ZR = R
+        while index < len(primes) and primes[index] <= m*D + D//2:
+            j = abs(primes[index] - m*D)
+            Xj , Zj = baby_steps[j]
+            accumulated = (accumulated * (XR*Zj - Xj*ZR))%n
+            index = index + 1
+        
+        if m == 1:
+            #R_previous is D*Q here, and (m+1)DQ = 2(DQ)
+            R_previous , R = R , montgomery_double(XD , ZD , a24 , n)
+        else:
+            R_previous , R = R , montgomery_add(R[0] , R[1] , XD , ZD , R_previous[0] , R_previous[1] , n)
+        m = m + 1
+    
+    return gcd(accumulated , n)
+
+
+
+
 """
 The fifth and final step is to implement the Lenstra Elliptic Curve Algorithm
 in full, using the helper functions above.
@@ -366,6 +790,22 @@ detail (Following the code)
                (note that increasing 'bound' and 'curves' essentially
                 specifies the amount of computation resources we wish to spend
                 on factoring n)
+               (iv)  mode: 'affine' (default) follows the steps below.
+                     'montgomery' uses the inversion-free Suyama curves and
+                     Montgomery ladder above, and detects a factor with a
+                     single gcd(Z,n) per curve (see lenstra_montgomery).
+               (v)   B2: optional stage 2 bound. If given, every curve that
+                     survives stage 1 is continued with affine_stage2 or
+                     montgomery_stage2 before moving on to the next curve.
+               (vi)  mode = 'batch' runs 'batch_size' affine curves at a time
+                     in lock-step, sharing one inversion per step
+                     (see lenstra_batch).
+               (vii) prepass: if True, run Pollard's p-1 and Williams' p+1
+                     (pollard_pm1.py) before the first curve.
+    
+    0. Unless prepass is False, try pollard_pm1.prepass(n , bound , B2) first.
+       It costs about as much as one curve, and finds p when p-1 or p+1 is
+       smooth. A composite factor is split again by lenstra, without prepass.
     
     1. Check that n%2 != 0 and n%3 != 0. 
         1a. The primes 2 and 3 cause problems when working with Elliptic Curves. 
@@ -390,12 +830,15 @@ detail (Following the code)
            of order 2, and we have also found a non-invertible element t of Z/nZ.
        4b. Calculate gcd(t,n). If this is neither 1 nor n, return it.
        
-    5. For K in 2,3,4,5,6,7,..., bound , calculate KP:
-        5a. If any of them fail, elliptic_multiply(*) will tell us the
+    5. Let K be the product of the largest powers of each prime <= bound
+       (see stage1_multiplier), and calculate KP:
+        5a. If this fails, elliptic_multiply_naf(*) will tell us the
             non-invertible element t in Z/nZ that caused this failure.
         5b. Calculate gcd(t,n). If this is neither 1 nor n, return it.
-        (5c. An alternative way for choosing K is to choose small powers of 
-            primes generated using primes_up_to(n) implemented on line 54.)
+        5c. If it is n, every prime hit the point at infinity at the same
+            time. Try another curve.
+        5d. If a stage 2 bound B2 was given, continue with affine_stage2 and
+            return gcd(t,n) if it is neither 1 nor n.
     
     6. If step 5 passes and curve_count < curves, try another curve.
         Else: return 'Failed to find factor with given bound and curves'.
@@ -404,11 +847,26 @@ detail (Following the code)
 """
 from random import randint
 from math import gcd
-from MillerRabinPrimalityTest import MillerRabin
+from primality import is_prime
+import pollard_pm1
 
-def lenstra(n , bound , curves):
+def lenstra(n , bound , curves , mode = 'affine' , B2 = None , batch_size = 32 , prepass = True):
     assert n%2 != 0 , 'please first factor out the prime 2'
     assert n%3 != 0 , 'please first factor out the prime 3'
+    assert mode in ('affine' , 'montgomery' , 'batch') , 'unknown mode'
+    if prepass and n > 1:
+        output = pollard_pm1.prepass(n , bound , B2)
+        if output != -1:
+            if is_prime(output):
+                return output
+            else:
+                return lenstra(output , bound , curves , mode , B2 , batch_size , prepass = False)
+    
+    if mode == 'montgomery':
+        return lenstra_montgomery(n , bound , curves , B2)
+    if mode == 'batch':
+        return lenstra_batch(n , bound , curves , B2 , batch_size)
+    
     discriminant = 0
     curves_tried = 0
     
@@ -444,10 +902,10 @@ def lenstra(n , bound , curves):
             guess = gcd(d , n)
             if guess != 1 and guess != n:
                 output = gcd(guess,n)
-                if MillerRabin(output) is True:
+                if is_prime(output):
                     return output
                 else:
-                    return lenstra(output , bound , curves)
+                    return lenstra(output , bound , curves , mode , B2 , batch_size , prepass = False)
             
             #Try getting lucky with starting point p
             xp , yp = p[0] , p[1]
@@ -456,76 +914,258 @@ def lenstra(n , bound , curves):
             except ValueError:
                 output = gcd((2*yp)%n , n)
                 
-                if MillerRabin(output) is True:
+                if is_prime(output):
                     return output
                 else:
-                    return lenstra(output , bound , curves)
+                    return lenstra(output , bound , curves , mode , B2 , batch_size , prepass = False)
                 
             except TypeError:
                 continue
             
             
             #If we reach here, we are not lucky
-            #prime_list = primes_up_to(bound)
-            
-            #for item in prime_list:
-            primes_to_check = primes_up_to(bound)
-            for count in range(10):
-                for item in primes_to_check:
-                    
-                    #before proceeding, check if current point produces factor
-                    try:
-                        slope_at_p = (((3*((xp**2)%n))%n + a)%n) * mod_inverse( (2*yp)%n , n)
-                    except ValueError:
-                        output = gcd((2*yp)%n , n)
-                        
-                        if MillerRabin(output) is True:
-                            return output
-                        else:
-                            return lenstra(output , bound , curves)
-                        
-                    except TypeError:
-                        break
-    
-                    
-                    #if it does not, update point
-                    success , value , new_point = elliptic_multiply(p , item , a , b , n)
-                    if success == -1:
-                        output = gcd(value,n)
-                        
-                        if MillerRabin(output) is True:
-                            return output
-                        else:
-                            return lenstra(output , bound , curves)
-                        
-                        
-                    p = new_point
-                    xp , yp = p[0] , p[1]
+            #stage 1: a single multiplication by k = product of all prime powers <= bound
+            success , value , p = elliptic_multiply_naf(p , stage1_multiplier(bound) , a , b , n)
+            if success == -1:
+                output = gcd(value,n)
+                if output == n:
+                    #every prime factor of n hit the point at infinity together
+                    continue
                 
+                if is_prime(output):
+                    return output
+                else:
+                    return lenstra(output , bound , curves , mode , B2 , batch_size , prepass = False)
+            
+            #stage 2: look for a single prime factor of the order in (bound,B2]
+            if B2 is not None:
+                output = affine_stage2(p , a , b , n , bound , B2)
+                if output != 1 and output != n:
+                    if is_prime(output):
+                        return output
+                    else:
+                        return lenstra(output , bound , curves , mode , B2 , batch_size , prepass = False)
                 
         #If we reach here, we failed to find a factor with specified bounds and curves
         #return 'Failed to find factor with specified smoothness bound and max curves tried'
         return -1
 
-                
-
-
-
-
-
-
-
-
-
 
 
+"""
+The same algorithm using Montgomery curves (mode = 'montgomery').
+
+    1. For each curve, pick a random sigma and run montgomery_stage1.
+    2. If gcd(Z , n) is 1 and a stage 2 bound B2 was given, run
+       montgomery_stage2 on the curve.
+    3. If the gcd is neither 1 nor n, we have found a factor.
+       3a. If the factor is not prime, recursively call lenstra on it.
+    4. If the gcd is n, every prime factor of n hit the point at infinity
+       at the same time. This curve is useless, try another one.
+    5. Return -1 if no factor was found with the given bound and curves.
+"""
 
+def lenstra_montgomery(n , bound , curves , B2 = None):
+    if n == 1:
+        return -1
+    if n < 7:
+        #no room for a curve (sigma is picked from [6 , n - 1]): the
+        #smallest prime factor, which is n itself for n = 5
+        return min(prime for prime in (2 , 3 , 5) if n % prime == 0)
+    
+    for _ in range(curves):
+        sigma = randint(6 , n - 1)
+        guess , curve = montgomery_stage1(n , bound , sigma)
+        
+        if guess == 1 and B2 is not None:
+            a24 , X , Z = curve
+            guess = montgomery_stage2(X , Z , a24 , n , bound , B2)
+        
+        if guess != 1 and guess != n:
+            if is_prime(guess):
+                return guess
+            else:
+                return lenstra_montgomery(guess , bound , curves , B2)
+    
+    return -1
 
 
+"""
+The affine algorithm with curves in lock-step (mode = 'batch').
+
+    1. Pick 'batch_size' random curves and points, as in lenstra.
+    2. Multiply all points by K = stage1_multiplier(bound) together with
+       elliptic_multiply_batch (and continue with affine_stage2_batch if B2
+       is given).
+    3. If some curve hits a non-invertible denominator t, compute gcd(t,n).
+       3a. If it is neither 1 nor n, we have found a factor (recursively call
+           lenstra_batch on it if it is not prime).
+       3b. If it is n, this curve is useless. Remove it from the batch and
+           start the batch again with the remaining curves.
+    4. Repeat with new batches until 'curves' curves have been tried.
+       Return -1 if no factor was found.
+"""
 
+def lenstra_batch(n , bound , curves , B2 = None , batch_size = 32):
+    if n == 1:
+        return -1
+    
+    K = stage1_multiplier(bound)
+    remaining = curves
+    while remaining > 0:
+        size = min(batch_size , remaining)
+        remaining = remaining - size
+        
+        ps , a_list = [] , []
+        for _ in range(size):
+            x0 , y0 , a = randint(0 , n-1) , randint(0 , n-1) , randint(0 , n-1)
+            b = (y0**2 - x0**3 - a*x0)%n
+            
+            #Try getting lucky with discriminant of curve
+            guess = gcd(4 * (a**3) + 27 * (b**2) , n)
+            if guess != 1 and guess != n:
+                if is_prime(guess):
+                    return guess
+                else:
+                    return lenstra_batch(guess , bound , curves , B2 , batch_size)
+            
+            ps.append((x0 , y0))
+            a_list.append(a)
+        
+        while ps != []:
+            success , index , value , results = elliptic_multiply_batch(ps , K , a_list , n)
+            if success == 1 and B2 is not None:
+                success , index , value , results = affine_stage2_batch(results , a_list , n , bound , B2)
+            
+            if success == 1:
+                break
+            
+            output = gcd(value , n)
+            if output != n:
+                if is_prime(output):
+                    return output
+                else:
+                    return lenstra_batch(output , bound , curves , B2 , batch_size)
+            
+            del ps[index]
+            del a_list[index]
+    
+    return -1
 
 
+"""
+Running curves in parallel
 
+Different curves are completely independent of each other, so we can try
+them on several processor cores at the same time.
 
+    1. ecm_curve runs stage 1 (and stage 2, if B2 is given) on a single
+       Montgomery curve and reports what happened as a dictionary:
+           {'curve': index, 'sigma': sigma, 'factor': gcd found,
+            'stage': 1 or 2 (None if nothing was found), 'seconds': time taken}
+    
+    2. lenstra_parallel hands out curves to a pool of worker processes.
+       2a. As soon as one worker returns a factor that is neither 1 nor n,
+           all other workers are terminated.
+       2b. 'timeout' is an optional wall-clock budget in seconds for the
+           whole run. When it runs out, all workers are terminated.
+       2c. Returns the factor found (or -1, as in lenstra) together with the
+           list of statistics of every curve that finished.
+       2d. If the factor found is not prime, recursively call lenstra_parallel
+           on it, within the remaining time budget. If that fails, the
+           composite factor is returned instead.
+       2e. As in lenstra, pollard_pm1.prepass runs first (unless prepass is
+           False), in the main process. A factor found there is reported
+           with 'stage': 'prepass' and no curve is started.
+
+The existing lenstra(n , bound , curves) remains the single process version.
+"""
+import time
+import multiprocessing
 
+def ecm_curve(arguments):
+    n , bound , B2 , sigma , index = arguments
+    start = time.time()
+    
+    stage = 1
+    guess , curve = montgomery_stage1(n , bound , sigma)
+    if guess == 1 and B2 is not None:
+        stage = 2
+        a24 , X , Z = curve
+        guess = montgomery_stage2(X , Z , a24 , n , bound , B2)
+    
+    if guess == 1 or guess == n:
+        stage = None
+    
+    return {'curve': index , 'sigma': sigma , 'factor': guess ,
+            'stage': stage , 'seconds': time.time() - start}
 
+def lenstra_parallel(n , bound , curves , B2 = None , workers = None , timeout = None , prepass = True):
+    assert n%2 != 0 , 'please first factor out the prime 2'
+    assert n%3 != 0 , 'please first factor out the prime 3'
+    
+    statistics = []
+    if n == 1:
+        return -1 , statistics
+    if n < 7:
+        #no room for a curve, as in lenstra_montgomery
+        return lenstra_montgomery(n , bound , curves) , statistics
+    
+    if timeout is not None:
+        deadline = time.time() + timeout
+    
+    output = -1
+    if prepass:
+        start = time.time()
+        output = pollard_pm1.prepass(n , bound , B2)
+        if output != -1:
+            statistics.append({'curve': None , 'sigma': None , 'factor': output ,
+                               'stage': 'prepass' , 'seconds': time.time() - start})
+    
+    if output == -1:
+        tasks = [(n , bound , B2 , randint(6 , n - 1) , index) for index in range(curves)]
+        pool = multiprocessing.Pool(workers)
+        try:
+            results = pool.imap_unordered(ecm_curve , tasks)
+            for _ in range(curves):
+                if timeout is None:
+                    result = results.next()
+                else:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        result = results.next(remaining)
+                    except multiprocessing.TimeoutError:
+                        break
+                
+                statistics.append(result)
+                if result['stage'] is not None:
+                    output = result['factor']
+                    break
+        finally:
+            pool.terminate()
+            pool.join()
+    
+    if output != -1 and not is_prime(output):
+        if timeout is not None:
+            timeout = max(deadline - time.time() , 0)
+        factor , more_statistics = lenstra_parallel(output , bound , curves , B2 , workers , timeout , prepass = False)
+        statistics = statistics + more_statistics
+        if factor != -1:
+            output = factor
+    
+    return output , statistics
+
+if __name__ == '__main__':
+    #small n used to crash the Montgomery curve path
+    assert lenstra(5 , 100 , 10 , 'montgomery') == 5
+    assert lenstra_montgomery(6 , 100 , 10) == 2
+    assert lenstra_parallel(5 , 100 , 10 , workers = 2) == (5 , [])
+    try:
+        lenstra_parallel(6 , 100 , 10 , workers = 2)
+    except AssertionError:
+        pass
+    else:
+        raise AssertionError('n = 6 should be rejected')
+    print(lenstra(1000003*1000033 , 2000 , 50 , 'montgomery' , B2 = 200000))
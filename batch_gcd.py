@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 17:52:06 2026
+
+@author: Zhao Yufan
+"""
+"""
+Problem:
+    "Given a large set of RSA moduli, find every modulus that shares a prime
+     with another one."
+
+Factoring each modulus with lenstra or quadratic_sieve is hopeless, and
+taking gcd(n_i , n_j) for every pair is quadratic in the number of moduli.
+Bernstein's batch gcd finds, for every n_i at once,
+    gcd(n_i , product of all the other n_j)
+in quasi-linear time:
+
+    1. Build a product tree (product_tree.py) over the moduli. Its root is
+       P = n_1 * n_2 * ... * n_k.
+
+    2. Go back down the tree, reducing P mod the SQUARE of every node
+       (remainder_tree on the tree of squares). At the bottom this gives
+       P mod n_i**2 for every i.
+
+    3. Since n_i divides P, (P mod n_i**2) / n_i = (P / n_i) mod n_i, and
+           gcd((P mod n_i**2) / n_i , n_i) = gcd(P / n_i , n_i).
+       This is 1 unless n_i shares a prime with some other modulus.
+
+Millions of moduli do not fit in a single tree, so audit works in chunks:
+
+    4. First pass: the product P_c of every chunk c (without keeping trees).
+       Together the P_c are as large as the whole input, so they are written
+       to a temporary file rather than kept in memory.
+    5. Second pass: for every chunk, build its tree of squares once, and
+       multiply together P_c mod n_i**2 over all chunks c, reading the P_c
+       back from the file one at a time. This is P mod n_i**2 as in step 2,
+       with only one chunk's tree and one P_c in memory at a time.
+       Chunks are independent, so they can be spread over a process pool.
+       Every worker reads the same file, so the P_c are never copied to
+       the workers.
+
+    6. If the gcd is n_i itself, both primes of n_i are shared (or n_i occurs
+       twice). Such moduli are compared pairwise with the other moduli that
+       share a prime, which are few.
+
+Moduli can be given as a list, or as the name of a file with one modulus
+per line (decimal, or hexadecimal with a 0x prefix). The file is read twice,
+so it is never held in memory as a whole. Any other iterable (such as a
+generator) can only be read once, so it is turned into a list first.
+
+SPECIFICATIONS:
+    batch_gcd(moduli) -> [gcd(n , product of the others) for n in moduli]
+    audit(moduli , chunk_size = 2**12 , workers = 1) -> generator of (modulus , factor)
+    (factor is a non-trivial factor of modulus, or modulus itself if it is
+     a duplicate)
+"""
+import multiprocessing
+import os
+import tempfile
+from math import gcd
+from product_tree import product , product_tree , remainder_tree
+
+def square_tree(tree):
+    return [[value * value for value in level] for level in tree]
+
+def batch_gcd(moduli):
+    moduli = list(moduli)
+    tree = product_tree(moduli)
+    remainders = remainder_tree(tree[-1][0] , square_tree(tree))
+    return [gcd(remainder // n , n) for n , remainder in zip(moduli , remainders)]
+
+def read_moduli(filename):
+    with open(filename) as file:
+        for line in file:
+            line = line.strip()
+            if line == '' or line.startswith('#'):
+                continue
+            if line.lower().startswith('0x'):
+                yield int(line , 16)
+            else:
+                yield int(line)
+
+def chunks(moduli , chunk_size):
+    if isinstance(moduli , str):
+        moduli = read_moduli(moduli)
+    chunk = []
+    for n in moduli:
+        chunk.append(n)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk != []:
+        yield chunk
+
+def write_products(moduli , chunk_size):
+    #the product of every chunk, as (8 byte length , bytes) records in a temporary file
+    with tempfile.NamedTemporaryFile('wb' , suffix = '.products' , delete = False) as file:
+        for chunk in chunks(moduli , chunk_size):
+            P = product(chunk)
+            data = P.to_bytes((P.bit_length() + 7) // 8 , 'big')
+            file.write(len(data).to_bytes(8 , 'big'))
+            file.write(data)
+    return file.name
+
+def read_products(filename):
+    with open(filename , 'rb') as file:
+        while True:
+            length = file.read(8)
+            if length == b'':
+                return
+            yield int.from_bytes(file.read(int.from_bytes(length , 'big')) , 'big')
+
+def shared_factors(arguments):
+    #(n , gcd) for every n in the chunk sharing a prime with any modulus
+    chunk , products_file = arguments
+    squares = square_tree(product_tree(chunk))
+    accumulated = [1] * len(chunk)
+    for P in read_products(products_file):
+        remainders = remainder_tree(P , squares)
+        accumulated = [(a * r) % (n * n) for a , r , n in zip(accumulated , remainders , chunk)]
+
+    found = []
+    for n , a in zip(chunk , accumulated):
+        g = gcd(a // n , n)
+        if g != 1:
+            found.append((n , g))
+    return found
+
+def audit(moduli , chunk_size = 2**12 , workers = 1):
+    if not isinstance(moduli , str):
+        moduli = list(moduli)
+    products_file = write_products(moduli , chunk_size)
+
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    pool = None
+    if workers != 1:
+        pool = multiprocessing.Pool(workers)
+    try:
+        tasks = ((chunk , products_file) for chunk in chunks(moduli , chunk_size))
+        if pool is None:
+            results = (shared_factors(task) for task in tasks)
+        else:
+            results = pool.imap(shared_factors , tasks)
+
+        suspects = []
+        fully_shared = []
+        for found in results:
+            for n , g in found:
+                suspects.append(n)
+                if g == n:
+                    fully_shared.append(n)
+                else:
+                    yield n , g
+    finally:
+        if pool is not None:
+            pool.terminate()
+        os.remove(products_file)
+
+    #both primes shared: compare with the other moduli sharing a prime
+    for n in fully_shared:
+        factor = n
+        for m in suspects:
+            g = gcd(n , m)
+            if g != 1 and g != n:
+                factor = g
+                break
+        yield n , factor
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 15:20:48 2026
+
+@author: Zhao Yufan
+"""
+"""
+Problem:
+    "Given an integer n, compute its complete prime factorization."
+
+Every other file in this repository finds a single factor, and each is only
+the right tool for some n. Here we chain them together:
+
+    1. Trial division by the primes up to 'trial_limit' (trial_division.py).
+       This removes all the small factors (and 2 and 3, which Lenstra needs
+       gone).
+    2. Whatever is left (the cofactor) goes on a stack. For each number m
+       taken from the stack:
+       2a. If m is prime (primality.py), it is a prime factor of n.
+       2b. If m = r**k is a perfect power, factor r instead and multiply the
+           exponents by k (the sieves cannot handle perfect powers).
+       2c. Otherwise, split m into two factors (split) and put both on
+           the stack.
+    3. split(m) tries the algorithms in order of cost, tuned by the number
+       of digits d of m:
+       3a. Fermat's and Lehman's methods (fermat.py) with a small iteration
+           budget, which take about half a millisecond and find factors of
+           any size when the two factors are close together.
+       3b. Pollard rho (pollard_rho.py) with a small iteration budget, which
+           finds factors of up to about 10 digits.
+       3c. Pollard's p-1 and Williams' p+1 (pollard_pm1.py), once, with the
+           bounds of the second ECM tier. They find factors p of any size
+           for which p-1 or p+1 is smooth, at the cost of about one curve.
+       3d. Lenstra's ECM (Montgomery curves, with stage 2), in tiers of
+           increasing B1. Each tier is tuned to find factors of a certain
+           number of digits. ECM's running time depends on the size of the
+           factor and not of m, so we run the tiers aimed at factors of up
+           to d/3 digits, which are cheap compared to the Quadratic Sieve.
+       3e. If m has at most 'qs_digits' digits, the Quadratic Sieve (SIQS),
+           whose running time only depends on the size of m.
+       3f. Otherwise (or if the sieve fails), every ECM tier, repeating the
+           last one until a factor turns up.
+
+SPECIFICATIONS:
+    factorint(n) -> {prime : exponent}
+    (factorint(1) = {} , negative n get the 'prime' -1)
+"""
+import LenstraEC
+import quadratic_sieve
+from math import gcd
+from primality import is_prime
+from prime_sieve import primes_up_to
+from product_tree import product
+from pollard_rho import pollard_rho
+from pollard_pm1 import prepass
+from trial_division import trial_division
+from fermat import fermat , lehman
+
+"""
+Perfect powers.
+
+integer_root(m , k) is the largest r with r**k <= m, by Newton's method on
+integers. m is a perfect k-th power exactly when r**k == m, and it is enough
+to try prime k up to log2(m).
+"""
+
+def integer_root(m , k):
+    if m < 2:
+        return m
+    r = 1 << ((m.bit_length() + k - 1) // k)
+    while True:
+        s = ((k - 1) * r + m // r**(k - 1)) // k
+        if s >= r:
+            return r
+        r = s
+
+def perfect_power(m):
+    #returns (r , k) with m = r**k and k as large as possible, k = 1 if none
+    for k in primes_up_to(m.bit_length()):
+        r = integer_root(m , k)
+        if r**k == m:
+            root , exponent = perfect_power(r)
+            return root , exponent * k
+    return m , 1
+
+"""
+The ECM tiers: (B1 , curves , digits), with B2 = 100*B1. These are the usual
+parameters for factors of about 'digits' digits.
+"""
+ecm_tiers = ((2000 , 25 , 15) , (11000 , 90 , 20) , (50000 , 300 , 25) , (250000 , 700 , 30) , (1000000 , 1800 , 35))
+
+def ecm(m , B1 , curves):
+    #the p-1/p+1 pre-pass already ran once in split
+    factor = LenstraEC.lenstra(m , B1 , curves , 'montgomery' , B2 = 100*B1 , prepass = False)
+    if factor != -1 and factor != m:
+        return factor
+    return None
+
+def siqs(m):
+    #the sieve needs m free of factors below its smoothness bound
+    B = quadratic_sieve.bound(m)
+    factor = gcd(m , product(primes_up_to(B)))
+    if factor == m:
+        #every prime factor of m is below the bound
+        small_factors , _ = trial_division(m , B)
+        return min(small_factors)
+    if factor != 1:
+        return factor
+    factor = quadratic_sieve.quadratic_sieve(m , 'siqs' , verbose = False)
+    if isinstance(factor , int) and 1 < factor < m:
+        return factor
+    return None
+
+def split(m , qs_digits = 60 , rho_iterations = 2**16 , fermat_iterations = 2**8):
+    factor = fermat(m , fermat_iterations)
+    if factor != -1:
+        return factor
+    factor = lehman(m , fermat_iterations)
+    if factor != -1:
+        return factor
+
+    factor = pollard_rho(m , rho_iterations)
+    if factor != -1:
+        return factor
+
+    B1 = ecm_tiers[1][0]
+    factor = prepass(m , B1 , 100*B1)
+    if factor != -1:
+        return factor
+
+    digits = len(str(m))
+    for B1 , curves , factor_digits in ecm_tiers:
+        if factor_digits > max(digits // 3 , 15):
+            break
+        factor = ecm(m , B1 , curves)
+        if factor is not None:
+            return factor
+
+    if digits <= qs_digits:
+        factor = siqs(m)
+        if factor is not None:
+            return factor
+
+    tier = 0
+    while True:
+        B1 , curves , factor_digits = ecm_tiers[tier]
+        factor = ecm(m , B1 , curves)
+        if factor is not None:
+            return factor
+        tier = min(tier + 1 , len(ecm_tiers) - 1)
+
+def factorint(n , trial_limit = 2**16 , qs_digits = 60):
+    assert n != 0 , '0 has no prime factorization'
+    factors = {}
+    if n < 0:
+        factors[-1] = 1
+        n = -n
+
+    small_factors , n = trial_division(n , trial_limit)
+    factors.update(small_factors)
+
+    #(number , exponent) pairs still to be factored
+    stack = [(n , 1)] if n > 1 else []
+    while stack:
+        m , exponent = stack.pop()
+        if is_prime(m):
+            factors[m] = factors.get(m , 0) + exponent
+            continue
+
+        root , power = perfect_power(m)
+        if power > 1:
+            stack.append((root , exponent * power))
+            continue
+
+        factor = split(m , qs_digits)
+        stack.append((factor , exponent))
+        stack.append((m // factor , exponent))
+
+    return dict(sorted(factors.items()))
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 18:21:37 2026
+
+@author: Zhao Yufan
+"""
+"""
+Problem:
+    "Given a composite number n = p*q with p and q close together, compute
+     a factor of n."
+
+A key generator that picks q as 'the next prime after p' (or p and q from
+nearby starting points) makes n easy to factor, however large n is.
+
+Fermat's method:
+    1. If n = p*q with p < q, then n = a**2 - b**2 with a = (p+q)/2 and
+       b = (q-p)/2. When p and q are close, a is just above sqrt(n).
+    2. So try a = ceil(sqrt(n)), ceil(sqrt(n)) + 1, ... and check whether
+       a**2 - n is a square b**2. Then a - b is a factor of n.
+    3. (a+1)**2 - n = (a**2 - n) + 2a + 1, so each step costs one addition.
+
+Most numbers are not squares, which we can tell without computing isqrt:
+a square is a square modulo every m. Only 12 of the 64 residues mod 64 are
+squares, 16 of 63, 21 of 65 and 6 of 11, so the four table lookups reject
+all but about 1 in 120 numbers, and isqrt is only computed for those.
+
+Lehman's method extends Fermat's to p/q close to a fraction u/v with small
+u and v instead of to 1: then 4*k*n (k = u*v) is the difference of two
+squares a**2 - b**2 with a just above sqrt(4*k*n), more precisely
+    sqrt(4kn) <= a <= sqrt(4kn) + n**(1/6)/(4*sqrt(k)).
+For every k = 1, 2, 3, ... we try that range of a, and gcd(a + b , n) is a
+factor. (Lehman's complete algorithm also trial divides up to n**(1/3) and
+goes up to k = n**(1/3). Here both methods only get an iteration budget,
+since they are an early check before the general purpose methods.)
+
+For large n that range of a is huge, and the budget would be spent on k = 1
+alone. So we only try the first 'window' values of a for every k. When p/q
+is very close to u/v (a weak key generator, again), the first a already
+works.
+
+SPECIFICATIONS:
+    fermat(n , max_iterations = 2**10) -> factor or -1
+    lehman(n , max_iterations = 2**10 , window = 4) -> factor or -1
+    (the factor is not always prime)
+"""
+from math import gcd , isqrt
+
+square_filters = []
+for modulus in (64 , 63 , 65 , 11):
+    squares = [False] * modulus
+    for x in range(modulus):
+        squares[(x * x) % modulus] = True
+    square_filters.append((modulus , squares))
+
+def square_root(x):
+    #the r with r*r = x, -1 if x is not a square
+    for modulus , squares in square_filters:
+        if not squares[x % modulus]:
+            return -1
+    r = isqrt(x)
+    if r * r == x:
+        return r
+    return -1
+
+def fermat(n , max_iterations = 2**10):
+    if n % 2 == 0:
+        return 2
+    a = isqrt(n)
+    if a * a < n:
+        a = a + 1
+    b2 = a * a - n
+    for _ in range(max_iterations):
+        b = square_root(b2)
+        if b != -1:
+            if a - b == 1:
+                #n = 1 * n, n is prime
+                return -1
+            return a - b
+        b2 = b2 + 2 * a + 1
+        a = a + 1
+    return -1
+
+def lehman(n , max_iterations = 2**10 , window = 4):
+    if n % 2 == 0:
+        return 2
+    #2**(bits/6) is about n**(1/6)
+    sixth_root = 1 << (n.bit_length() // 6)
+    iterations = 0
+    k = 1
+    while iterations < max_iterations:
+        a = isqrt(4 * k * n)
+        if a * a < 4 * k * n:
+            a = a + 1
+        a_max = a + min(sixth_root // (4 * isqrt(k)) , window - 1)
+        while a <= a_max and iterations < max_iterations:
+            b = square_root(a * a - 4 * k * n)
+            if b != -1:
+                factor = gcd(a + b , n)
+                if factor != 1 and factor != n:
+                    return factor
+            a = a + 1
+            iterations = iterations + 1
+        k = k + 1
+    return -1
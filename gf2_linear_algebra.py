@@ -0,0 +1,587 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 11:02:17 2026
+
+@author: Zhao Yufan
+"""
+"""
+Linear algebra over GF(2) for the sieves.
+
+Both the Rational Sieve and the Quadratic Sieve end with the same problem:
+
+    "Given a list of relations, each with a vector of exponents mod 2,
+     find subsets of relations whose vectors add up to 0 (mod 2)."
+
+Each subset is an element of the (left) null space of the relation matrix,
+and gives us a congruence of squares.
+
+A matrix with one Python int per entry wastes a lot of memory, and adding two
+rows entry by entry with % 2 is slow. Instead, we store each row as a single
+Python integer, where bit j is the entry in column j:
+
+    [1, 0, 1, 1]  ->  0b1101 = 13
+
+Adding two rows over GF(2) is then a single XOR, which Python performs on
+whole machine words at a time. A row with 50000 columns takes about 6 KB.
+"""
+
+"""
+pack_rows turns a list-of-lists matrix with 0/1 entries into a list of
+bit-packed rows.
+"""
+
+def pack_rows(matrix):
+    rows = []
+    for row in matrix:
+        packed = 0
+        for j in range(len(row)):
+            if row[j] % 2 == 1:
+                packed = packed | (1 << j)
+        rows.append(packed)
+    return rows
+
+"""
+Gaussian elimination on bit-packed rows.
+
+Along with each row we keep a 'history': another bit-packed integer recording
+which of the original rows were added together to produce it (row i starts
+with history 1 << i). Whenever a row becomes zero, its history is a set of
+original rows adding up to 0: an element of the null space. Every such row
+gives an independent null space vector, so we get a whole basis of the null
+space in a single pass (at least rows - columns of them).
+
+Eliminating one column at a time costs one XOR per row per column. To save
+work we use the 'Method of Four Russians' and handle k columns (the lowest k
+bits of every row) at once:
+
+    1. Find up to k pivot rows for these k columns, and reduce them against
+       each other so that each pivot has a 1 in 'its' column and 0 in the
+       columns of the other pivots.
+    2. Precompute all 2**k sums of pivot rows in a table, keyed by the bits
+       they have in the pivot columns.
+    3. Every other row is cleared in these k columns with a SINGLE lookup and
+       XOR, instead of up to k of them.
+    4. The pivot rows are finished. The remaining rows are now 0 in these k
+       columns, so we shift them right by k bits and repeat on the next k columns.
+
+SPECIFICATIONS:
+
+Input: a list of bit-packed rows (see pack_rows).
+Output: a list of dependencies. Each dependency is a list of row indices whose
+        rows add up to 0 over GF(2). The list is empty if there are none.
+"""
+
+def null_space(rows , block_size = None):
+    rows = list(rows)
+    histories = [1 << i for i in range(len(rows))]
+    if block_size is None:
+        block_size = max(1 , min(12 , len(rows).bit_length() - 3))
+    mask = (1 << block_size) - 1
+    
+    dependencies = []
+    remaining = list(range(len(rows)))
+    while remaining != []:
+        #rows that are already 0 are dependencies
+        non_zero = []
+        for r in remaining:
+            if rows[r] == 0:
+                dependencies.append(bits_to_indices(histories[r]))
+            else:
+                non_zero.append(r)
+        
+        #step 1: find pivots among the lowest block_size bits
+        pivots = []
+        rest = []
+        for position in range(len(non_zero)):
+            r = non_zero[position]
+            if len(pivots) == block_size:
+                rest.extend(non_zero[position:])
+                break
+            
+            for bit , p in pivots:
+                if rows[r] & bit:
+                    rows[r] = rows[r] ^ rows[p]
+                    histories[r] = histories[r] ^ histories[p]
+            
+            strip = rows[r] & mask
+            if strip == 0:
+                rest.append(r)
+                continue
+            
+            bit = strip & (-strip)
+            for other_bit , p in pivots:
+                if rows[p] & bit:
+                    rows[p] = rows[p] ^ rows[r]
+                    histories[p] = histories[p] ^ histories[r]
+            pivots.append((bit , r))
+        
+        #step 2: table of all sums of pivot rows
+        table = {0 : (0 , 0)}
+        for bit , p in pivots:
+            for key , (row , history) in list(table.items()):
+                table[key | bit] = (row ^ rows[p] , history ^ histories[p])
+        pivot_mask = sum(bit for bit , p in pivots)
+        
+        #steps 3 and 4
+        for r in rest:
+            key = rows[r] & pivot_mask
+            if key != 0:
+                row , history = table[key]
+                rows[r] = rows[r] ^ row
+                histories[r] = histories[r] ^ history
+            rows[r] = rows[r] >> block_size
+        
+        remaining = rest
+    
+    return dependencies
+
+def bits_to_indices(bits):
+    indices = []
+    while bits != 0:
+        low_bit = bits & (-bits)
+        indices.append(low_bit.bit_length() - 1)
+        bits = bits ^ low_bit
+    return indices
+
+"""
+Sparse matrices
+
+The relation matrices of the sieves are extremely sparse: a relation only
+involves a handful of primes (a few dozen at most), out of a factor base of
+thousands. Storing them densely wastes memory: 50000 x 50000 bits is over
+300 MB, while the non-zero entries fit in a few MB.
+
+We store the matrix relation by relation (compressed sparse rows, 'CSR'):
+    - 'indices' lists the columns with an odd exponent of every relation,
+      one relation after another.
+    - relation i owns indices[offsets[i] : offsets[i+1]].
+Both are compact arrays of machine integers.
+"""
+from array import array
+import random
+
+def sparse_matrix(relation_columns):
+    offsets = array('L' , [0])
+    indices = array('L')
+    for columns in relation_columns:
+        indices.extend(columns)
+        offsets.append(len(indices))
+    return offsets , indices
+
+def sparse_row(matrix , i):
+    offsets , indices = matrix
+    return indices[offsets[i] : offsets[i+1]]
+
+"""
+Filtering
+
+Before doing linear algebra, we can make the matrix much smaller:
+
+    1. Singletons: if a column (prime) appears in only one relation, that
+       relation can never be part of a dependency. Remove it. Removing it may
+       create new singletons, so repeat until there are none.
+    2. Cliques: if a column appears in exactly two relations, any dependency
+       must use both of them or neither. Merge the two into one relation
+       (adding their rows), which removes that column and one relation.
+       We only merge if the merged relation does not get too heavy, so the
+       matrix stays sparse.
+    3. Renumber the columns that are still in use.
+
+SPECIFICATIONS:
+
+Input: a list of relations, each given as a list of column indices.
+Output: groups , matrix , columns_used
+    1. groups[k] is the list of original relations merged into relation k
+    2. matrix is the filtered relations in sparse form (see sparse_matrix)
+    3. columns_used is the number of columns of the filtered matrix
+"""
+
+def filter_relations(relation_columns , max_weight = 50):
+    relations = {i : set(relation_columns[i]) for i in range(len(relation_columns))}
+    groups = {i : [i] for i in range(len(relation_columns))}
+    
+    #for every column, the set of relations that use it
+    where = {}
+    for i in relations:
+        for column in relations[i]:
+            where.setdefault(column , set()).add(i)
+    
+    changed = True
+    while changed:
+        changed = False
+        for column in list(where):
+            if column not in where:
+                continue
+            users = where[column]
+            if len(users) == 0:
+                del where[column]
+            
+            elif len(users) == 1:
+                #singleton: remove the relation
+                i = users.pop()
+                for other_column in relations[i]:
+                    where[other_column].discard(i)
+                del relations[i] , groups[i]
+                del where[column]
+                changed = True
+            
+            elif len(users) == 2:
+                i , j = users
+                merged = relations[i] ^ relations[j]
+                if len(merged) > max_weight:
+                    continue
+                #clique: replace relation i by i + j, remove relation j
+                for other_column in relations[i] | relations[j]:
+                    where[other_column].discard(i)
+                    where[other_column].discard(j)
+                for other_column in merged:
+                    where[other_column].add(i)
+                relations[i] = merged
+                groups[i] = groups[i] + groups[j]
+                del relations[j] , groups[j]
+                del where[column]
+                changed = True
+    
+    renumber = {}
+    for column in sorted(where):
+        if len(where[column]) > 0:
+            renumber[column] = len(renumber)
+    
+    keys = sorted(relations)
+    matrix = sparse_matrix([sorted(renumber[column] for column in relations[i]) for i in keys])
+    return [groups[i] for i in keys] , matrix , len(renumber)
+
+"""
+Block Lanczos
+
+Bit-packed Gaussian elimination needs two dense n x n bit matrices (the rows
+and their histories), about n**2 / 4 bytes: 1 GB for n = 64000. Montgomery's
+Block Lanczos algorithm only ever multiplies the sparse matrix by vectors, so
+the matrix is never modified and memory stays proportional to its weight.
+
+In pure Python it is not faster, though. On random sparse matrices with 10 -
+20 entries per relation (weighted towards the small primes, as in the sieves)
+we measured:
+
+    size        null_space      block_lanczos
+    2000           0.2 s             1.1 s
+    4000           0.6 s             4.5 s
+    8000           6.3 s            17.3 s
+    16000         38.6 s            72.6 s
+    32000        227 s             296 s
+
+The gap is closing, but Gaussian elimination is faster at every size the
+sieves here reach, so block_lanczos is only used when asked for (to save
+memory).
+
+Write B for the matrix whose columns are the relations (so we want B*x = 0),
+and A = transpose(B)*B, which is symmetric. Block Lanczos works with
+'blocks' of 64 vectors at once: a block of n vectors is stored as a list of n
+64-bit integers, where bit j of entry i is the i-th coordinate of vector j.
+Multiplying B by a block is then a sequence of XORs of whole words.
+
+The iteration (Montgomery 1995) builds blocks V_0 , V_1 , V_2 , ... which are
+A-orthogonal to each other:
+    V_(i+1) = A*V_i*S_i*S_i' + V_i*D_(i+1) + V_(i-1)*E_(i+1) + V_(i-2)*F_(i+1)
+where S_i selects the columns of V_i for which V_i'*A*V_i is invertible
+(find_nonsingular_sub), and D, E, F are 64x64 matrices computed from the
+previous three steps. Starting from V_0 = A*Y for a random block Y, it
+accumulates X = Y + sum of V_i * W_i * V_i' * V_0, stopping when V_m'*A*V_m = 0.
+Then A*(X) and A*(V_m) are (mostly) 0, and a final Gaussian elimination
+on the 128 vectors of X and V_m (combine_block_lanczos) gives vectors with B*x = 0.
+
+The 64x64 matrices are lists of 64 integers, one per row.
+"""
+
+def multiply_64(a , b):
+    product = []
+    for row in a:
+        result = 0
+        while row != 0:
+            low_bit = row & (-row)
+            result = result ^ b[low_bit.bit_length() - 1]
+            row = row ^ low_bit
+        product.append(result)
+    return product
+
+def byte_tables(m):
+    #tables[k][byte] = XOR of the rows 8k+t of m, for the bits t set in byte
+    tables = []
+    for k in range(8):
+        table = [0]*256
+        for t in range(8):
+            row = m[8*k + t]
+            step = 1 << t
+            for value in range(step , 2*step):
+                table[value] = table[value - step] ^ row
+        tables.append(table)
+    return tables
+
+def multiply_block(v , m , accumulate = None):
+    #returns v*m (n x 64 times 64 x 64), XORed into 'accumulate' if given
+    t0 , t1 , t2 , t3 , t4 , t5 , t6 , t7 = byte_tables(m)
+    if accumulate is None:
+        accumulate = [0]*len(v)
+    for i in range(len(v)):
+        word = v[i]
+        if word != 0:
+            accumulate[i] = accumulate[i] ^ (t0[word & 255] ^ t1[(word >> 8) & 255]
+                            ^ t2[(word >> 16) & 255] ^ t3[(word >> 24) & 255]
+                            ^ t4[(word >> 32) & 255] ^ t5[(word >> 40) & 255]
+                            ^ t6[(word >> 48) & 255] ^ t7[(word >> 56) & 255])
+    return accumulate
+
+def transpose_multiply(x , y):
+    #returns x'*y (64 x n times n x 64)
+    sums = [[0]*256 for _ in range(8)]
+    for i in range(len(x)):
+        word = x[i]
+        if word != 0:
+            value = y[i]
+            for k in range(8):
+                byte = (word >> (8*k)) & 255
+                if byte != 0:
+                    sums[k][byte] = sums[k][byte] ^ value
+    
+    product = [0]*64
+    for k in range(8):
+        for byte in range(1 , 256):
+            value = sums[k][byte]
+            if value != 0:
+                for t in range(8):
+                    if (byte >> t) & 1:
+                        product[8*k + t] = product[8*k + t] ^ value
+    return product
+
+def multiply_sparse(matrix , v , rows_used):
+    #returns B*v, where the relations of 'matrix' are the columns of B
+    offsets , indices = matrix
+    product = [0]*rows_used
+    for i in range(len(offsets) - 1):
+        word = v[i]
+        if word != 0:
+            for column in indices[offsets[i] : offsets[i+1]]:
+                product[column] = product[column] ^ word
+    return product
+
+def multiply_sparse_transpose(matrix , w):
+    #returns B'*w
+    offsets , indices = matrix
+    product = []
+    for i in range(len(offsets) - 1):
+        word = 0
+        for column in indices[offsets[i] : offsets[i+1]]:
+            word = word ^ w[column]
+        product.append(word)
+    return product
+
+def multiply_symmetric(matrix , v , rows_used):
+    return multiply_sparse_transpose(matrix , multiply_sparse(matrix , v , rows_used))
+
+"""
+find_nonsingular_sub(t , last_s) chooses a set s of columns of the 64x64
+matrix t such that the submatrix of t on s is invertible, preferring columns
+that were NOT chosen in the previous step (last_s), as Montgomery requires.
+Returns (s , w), where w is the inverse of that submatrix, padded with zeros.
+Returns (None , None) if this is impossible (the iteration failed).
+"""
+
+def find_nonsingular_sub(t , last_s):
+    M = [[t[i] , 1 << i] for i in range(64)]
+    
+    last_mask = 0
+    for i in last_s:
+        last_mask = last_mask | (1 << i)
+    order = [i for i in range(64) if not (last_mask >> i) & 1] + list(last_s)
+    
+    s = []
+    for position in range(64):
+        i = order[position]
+        bit = 1 << i
+        
+        pivot = None
+        for other in order[position:]:
+            if M[other][0] & bit:
+                pivot = other
+                break
+        
+        if pivot is not None:
+            M[i] , M[pivot] = M[pivot] , M[i]
+            for other in range(64):
+                if other != i and M[other][0] & bit:
+                    M[other][0] = M[other][0] ^ M[i][0]
+                    M[other][1] = M[other][1] ^ M[i][1]
+            s.append(i)
+            continue
+        
+        #no pivot in the left half: use the right half instead, and drop row i
+        for other in order[position:]:
+            if M[other][1] & bit:
+                pivot = other
+                break
+        if pivot is None:
+            return None , None
+        
+        M[i] , M[pivot] = M[pivot] , M[i]
+        for other in range(64):
+            if other != i and M[other][1] & bit:
+                M[other][0] = M[other][0] ^ M[i][0]
+                M[other][1] = M[other][1] ^ M[i][1]
+        M[i] = [0 , 0]
+    
+    return s , [M[i][1] for i in range(64)]
+
+def block_lanczos_iteration(matrix , rows_used , rng):
+    n = len(matrix[0]) - 1
+    identity = [1 << i for i in range(64)]
+    zero = [0]*64
+    
+    x = [rng.getrandbits(64) for _ in range(n)]
+    v0 = multiply_symmetric(matrix , x , rows_used)
+    v = [v0 , [0]*n , [0]*n]
+    winv = [None , zero , zero]
+    vt_a_v = [None , zero]
+    vt_a2_v = [None , zero]
+    s1 = list(range(64))
+    mask1 = (1 << 64) - 1
+    
+    for _ in range(n // 32 + 100):
+        a_v = multiply_symmetric(matrix , v[0] , rows_used)
+        vt_a_v[0] = transpose_multiply(v[0] , a_v)
+        vt_a2_v[0] = transpose_multiply(a_v , a_v)
+        if not any(vt_a_v[0]):
+            break
+        
+        s0 , winv[0] = find_nonsingular_sub(vt_a_v[0] , s1)
+        if s0 is None or s0 == []:
+            return None , None
+        mask0 = 0
+        for i in s0:
+            mask0 = mask0 | (1 << i)
+        
+        d = multiply_64(winv[0] , [(vt_a2_v[0][i] & mask0) ^ vt_a_v[0][i] for i in range(64)])
+        d = [d[i] ^ identity[i] for i in range(64)]
+        
+        e = multiply_64(winv[1] , vt_a_v[0])
+        e = [row & mask0 for row in e]
+        
+        f = multiply_64(vt_a_v[1] , winv[1])
+        f = multiply_64(winv[2] , [f[i] ^ identity[i] for i in range(64)])
+        f2 = [((vt_a2_v[1][i] & mask1) ^ vt_a_v[1][i]) & mask0 for i in range(64)]
+        f = multiply_64(f , f2)
+        
+        v_next = [word & mask0 for word in a_v]
+        multiply_block(v[0] , d , v_next)
+        multiply_block(v[1] , e , v_next)
+        multiply_block(v[2] , f , v_next)
+        
+        #update the solution x
+        multiply_block(v[0] , multiply_64(winv[0] , transpose_multiply(v[0] , v0)) , x)
+        
+        v = [v_next , v[0] , v[1]]
+        winv = [None , winv[0] , winv[1]]
+        vt_a_v = [None , vt_a_v[0]]
+        vt_a2_v = [None , vt_a2_v[0]]
+        s1 , mask1 = s0 , mask0
+    else:
+        return None , None
+    
+    return x , v[0]
+
+"""
+combine_block_lanczos: the 128 vectors in x and v (the last block) satisfy
+A*y = 0 (mostly), but we want B*y = 0. Compute B*x and B*v, and do Gaussian
+elimination on the 128 pairs (B*y , y): every pair whose first half becomes 0
+gives a vector y with B*y = 0. Returns the non-zero ones, as bit-packed sets of
+relations, reduced so that they are linearly independent.
+"""
+
+def unpack_block(block):
+    vectors = [0]*64
+    for i in range(len(block)):
+        word = block[i]
+        while word != 0:
+            low_bit = word & (-word)
+            j = low_bit.bit_length() - 1
+            vectors[j] = vectors[j] | (1 << i)
+            word = word ^ low_bit
+    return vectors
+
+def combine_block_lanczos(matrix , rows_used , x , v):
+    pairs = list(zip(unpack_block(multiply_sparse(matrix , x , rows_used)) , unpack_block(x)))
+    pairs = pairs + list(zip(unpack_block(multiply_sparse(matrix , v , rows_used)) , unpack_block(v)))
+    
+    image_pivots = {}
+    kernel = []
+    for image , vector in pairs:
+        while image != 0:
+            low_bit = image & (-image)
+            if low_bit in image_pivots:
+                pivot_image , pivot_vector = image_pivots[low_bit]
+                image = image ^ pivot_image
+                vector = vector ^ pivot_vector
+            else:
+                image_pivots[low_bit] = (image , vector)
+                break
+        if image == 0 and vector != 0:
+            kernel.append(vector)
+    
+    #keep a linearly independent subset
+    vector_pivots = {}
+    for vector in kernel:
+        while vector != 0:
+            low_bit = vector & (-vector)
+            if low_bit in vector_pivots:
+                vector = vector ^ vector_pivots[low_bit]
+            else:
+                vector_pivots[low_bit] = vector
+                break
+    return list(vector_pivots.values())
+
+def block_lanczos(matrix , rows_used , seed = None , attempts = 5):
+    rng = random.Random(seed)
+    for _ in range(attempts):
+        x , v = block_lanczos_iteration(matrix , rows_used , rng)
+        if x is None:
+            continue
+        dependencies = combine_block_lanczos(matrix , rows_used , x , v)
+        if dependencies != []:
+            return [bits_to_indices(vector) for vector in dependencies]
+    return []
+
+"""
+Putting it together: find_dependencies(relation_columns) returns a list of
+dependencies (lists of indices of the original relations), like null_space.
+
+    1. Filter the matrix (remove singletons, merge cliques).
+    2. mode = 'dense': null_space on bit-packed rows.
+       mode = 'lanczos': block_lanczos on the sparse matrix.
+    3. Translate dependencies between filtered relations back to the original
+       relations, using the groups from filtering.
+"""
+
+def find_dependencies(relation_columns , mode = 'dense'):
+    assert mode in ('dense' , 'lanczos') , 'unknown mode'
+    groups , matrix , columns_used = filter_relations(relation_columns)
+    size = len(groups)
+    if size == 0:
+        return []
+    
+    if mode == 'dense':
+        rows = []
+        for i in range(size):
+            row = 0
+            for column in sparse_row(matrix , i):
+                row = row | (1 << column)
+            rows.append(row)
+        dependencies = null_space(rows)
+    else:
+        dependencies = block_lanczos(matrix , columns_used)
+    
+    result = []
+    for dependency in dependencies:
+        original = []
+        for k in dependency:
+            original.extend(groups[k])
+        result.append(sorted(original))
+    return result
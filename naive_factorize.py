@@ -10,7 +10,8 @@ import math
 
 
 def naive_factorize(n):
-    maxfactor = math.floor(math.sqrt(n))+1
+    #math.isqrt is exact, math.sqrt is not for n above 2**53
+    maxfactor = math.isqrt(n)
     for number in range(2,maxfactor+1):
         if n%number == 0:
             return number
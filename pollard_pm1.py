@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 16:48:30 2026
+
+@author: Zhao Yufan
+"""
+"""
+Problem:
+    "Given a composite number n, compute a prime factor of n."
+
+Pollard's p-1 algorithm (1974) is the ancestor of Lenstra's method: instead of
+the group of points on an elliptic curve over Z/pZ, it uses the group
+(Z/pZ)*, whose order is always p-1. Williams' p+1 algorithm (1982) uses a
+subgroup of order p+1 instead. There is only one group of each kind for a
+given p, so these methods only work when p-1 (or p+1) happens to be smooth,
+but when it is, they are much cheaper than a single elliptic curve. This is
+why lenstra runs them first (prepass).
+
+Pollard's p-1:
+    1. Stage 1: if every prime power dividing p-1 is at most B1, then p-1
+       divides K = stage1_multiplier(B1) (from prime_sieve.py), so
+           a**K = 1 (mod p) and p divides gcd(a**K - 1 , n).
+       This is a single modular exponentiation.
+    2. If the gcd is n, every prime factor of n was found at once. We redo
+       stage 1 one prime power at a time, and stop as soon as the gcd is not 1.
+    3. Stage 2: p-1 may also be B1-smooth apart from one prime q in (B1 , B2].
+       Then x = a**K satisfies x**q = 1 (mod p).
+
+Williams' p+1:
+    1. Lucas sequences: V_0 = 2, V_1 = A, V_(k+1) = A*V_k - V_(k-1) (mod n).
+       They satisfy V_2k = V_k**2 - 2 and V_(j+k) = V_j*V_k - V_(k-j), so V_K
+       can be computed with a ladder, like Montgomery's (lucas_v).
+    2. If (A**2 - 4)/p is a quadratic non-residue (Legendre symbol -1) and
+       p+1 divides K, then V_K = 2 (mod p). Otherwise (residue), the same
+       holds when p-1 divides K. We do not know p, so we try a few A.
+    3. The same stage 2 as p-1 (below).
+
+Stage 2 for both (lucas_stage2), by baby-step giant-step:
+    After stage 1 we have v = V_K, i.e. v = x + 1/x for some x in a group of
+    order dividing p-1 or p+1 (for p-1, x = a**K and we set v = x + 1/x).
+    Write every prime q in (B1 , B2] as q = m*D +- j with j < D/2. Then
+        V_(mD) - V_j = 0 (mod p)  if  x**(mD) = x**(+-j) (mod p),
+    which is the case when x**q = 1 (mod p). As in montgomery_stage2, we
+    multiply all V_(mD) - V_j together and take a single gcd at the end.
+
+SPECIFICATIONS:
+    pollard_pm1(n , bound , B2 = None , base = 2) -> factor or -1
+    williams_pp1(n , bound , B2 = None , seeds = ((2 , 7) , (6 , 5))) -> factor or -1
+    prepass(n , bound , B2 = None) -> factor or -1
+
+The factor returned is not always prime: if two primes of n both have a
+smooth p-1, they can come out together.
+"""
+from math import gcd
+from prime_sieve import primes_up_to , primes_between , stage1_multiplier , stage2_giant_step
+
+def lucas_v(v , k , n):
+    #V_k of the Lucas sequence with V_1 = v, by a ladder over (V_m , V_(m+1))
+    if k == 0:
+        return 2
+    V0 , V1 = v , (v*v - 2) % n
+    for bit in bin(k)[3:]:
+        if bit == '1':
+            V0 , V1 = (V0*V1 - v) % n , (V1*V1 - 2) % n
+        else:
+            V0 , V1 = (V0*V0 - 2) % n , (V0*V1 - v) % n
+    return V0
+
+def lucas_stage2(v , n , bound , B2):
+    primes = list(primes_between(max(bound , 3) + 1 , B2))
+    if primes == []:
+        return 1
+
+    D = stage2_giant_step(bound , B2)
+
+    #baby steps: V_j for odd j < D/2, computed 2 apart
+    V2 = (v*v - 2) % n
+    baby_steps = {1 : v}
+    previous , current = v , (v*V2 - v) % n
+    for j in range(3 , D//2 , 2):
+        if gcd(j , D) == 1:
+            baby_steps[j] = current
+        previous , current = current , (current*V2 - previous) % n
+
+    #giant steps: V_(mD), starting from the first m we need
+    VD = lucas_v(v , D , n)
+    m = max(1 , (primes[0] + D//2)//D)
+    R_previous = lucas_v(v , (m-1)*D , n)
+    R = lucas_v(v , m*D , n)
+
+    accumulated = 1
+    index = 0
+    while index < len(primes):
+        while index < len(primes) and primes[index] <= m*D + D//2:
+            j = abs(primes[index] - m*D)
+            accumulated = (accumulated * (R - baby_steps[j])) % n
+            index = index + 1
+        R_previous , R = R , (R*VD - R_previous) % n
+        m = m + 1
+
+    return gcd(accumulated , n)
+
+def pm1_backtrack(n , bound , base):
+    #stage 1 again, one prime power at a time
+    x = base
+    for prime in primes_up_to(bound):
+        prime_power = prime
+        while prime_power * prime <= bound:
+            prime_power = prime_power * prime
+        x = pow(x , prime_power , n)
+        output = gcd(x - 1 , n)
+        if output == n:
+            return -1
+        if output != 1:
+            return output
+    return -1
+
+def pollard_pm1(n , bound , B2 = None , base = 2):
+    x = pow(base , stage1_multiplier(bound) , n)
+    output = gcd(x - 1 , n)
+    if output == n:
+        return pm1_backtrack(n , bound , base)
+    if output != 1:
+        return output
+
+    if B2 is not None:
+        #x + 1/x, so that stage 2 catches x**q = 1 and x**(-q) = 1 alike
+        output = gcd(x , n)
+        if output == n:
+            return -1
+        if output != 1:
+            return output
+        output = lucas_stage2((x + pow(x , -1 , n)) % n , n , bound , B2)
+        if output != 1 and output != n:
+            return output
+    return -1
+
+def williams_pp1(n , bound , B2 = None , seeds = ((2 , 7) , (6 , 5))):
+    K = stage1_multiplier(bound)
+    for numerator , denominator in seeds:
+        output = gcd(denominator , n)
+        if output == n:
+            #the seed is 0/0 mod n, try the next one
+            continue
+        if output != 1:
+            return output
+        A = (numerator * pow(denominator , -1 , n)) % n
+        v = lucas_v(A , K , n)
+        output = gcd(v - 2 , n)
+        if output != 1 and output != n:
+            return output
+
+        if output == 1 and B2 is not None:
+            output = lucas_stage2(v , n , bound , B2)
+            if output != 1 and output != n:
+                return output
+    return -1
+
+"""
+The pre-pass run by lenstra before any curve: p-1 with 4 times the bound (a
+modular exponentiation is far cheaper than a curve with the same bound),
+then p+1 with a single seed and the curves' own bound. Together they cost
+about as much as a single curve.
+"""
+def prepass(n , bound , B2 = None):
+    output = pollard_pm1(n , 4*bound , B2)
+    if output != -1:
+        return output
+    return williams_pp1(n , bound , B2 , seeds = ((2 , 7) ,))
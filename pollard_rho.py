@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 16:02:13 2026
+
+@author: Zhao Yufan
+"""
+"""
+Problem:
+    "Given a composite number n, compute a prime factor of n."
+
+Pollard's rho algorithm is the cheapest method for composites with a factor
+p of up to 10 - 20 digits, which is exactly what is left over after trial
+division in the sieves and in quadratic_sieve.prime_factors.
+
+    1. Iterate f(x) = x**2 + c (mod n). Modulo the unknown prime p, the
+       sequence must repeat after about sqrt(p) steps (birthday paradox), and
+       then x_i = x_j (mod p) for some i != j, so gcd(x_i - x_j , n) > 1.
+
+    2. Brent's cycle detection: keep x fixed at x_(r) for r = 1, 2, 4, 8, ...
+       and compare it with y = x_(r+1), ..., x_(2r). This needs one
+       evaluation of f per step (Floyd's method needs three).
+
+    3. Batching: instead of a gcd at every step, multiply |x - y| for 'batch'
+       steps together (mod n) and take a single gcd of the product.
+
+    4. Backtracking: if the gcd of the product is n, several factors were
+       found within the same batch (or the cycle closed mod n). We go back
+       to the start of the batch and take the gcd at every step. If even
+       that gives n, we try again with a different c.
+
+As in lenstra, a composite factor is split again recursively, so the answer
+is normally prime. If the budget runs out while splitting it, the composite
+factor itself is returned (it is still a proper factor of n). We return -1
+only when no factor was found at all within the iteration budget.
+
+SPECIFICATIONS:
+    pollard_rho(n , max_iterations = 2**20 , batch = 100 , attempts = 5) -> factor or -1
+    (1 < factor < n, prime unless it could not be split within the budget)
+"""
+from math import gcd
+from primality import is_prime
+
+def brent(n , c , x0 , batch , max_iterations):
+    #one run with f(x) = x**2 + c, returns gcd (1 if out of budget, may be n)
+    y = x0
+    r = 1
+    q = 1
+    g = 1
+    while g == 1:
+        x = y
+        for _ in range(r):
+            y = (y*y + c) % n
+        k = 0
+        while k < r and g == 1:
+            ys = y
+            for _ in range(min(batch , r - k)):
+                y = (y*y + c) % n
+                q = (q * abs(x - y)) % n
+            g = gcd(q , n)
+            k = k + batch
+        r = 2 * r
+        if max_iterations is not None and r > max_iterations:
+            break
+
+    #also on the budget exit: the last batch may have closed the cycle mod n
+    if g == n:
+        #backtrack to the start of the last batch
+        g = 1
+        while g == 1:
+            ys = (ys*ys + c) % n
+            g = gcd(abs(x - ys) , n)
+    return g
+
+def pollard_rho(n , max_iterations = 2**20 , batch = 100 , attempts = 5):
+    if n % 2 == 0:
+        return 2
+    for c in range(1 , attempts + 1):
+        output = brent(n , c , 2 , batch , max_iterations)
+        if output != 1 and output != n:
+            if is_prime(output):
+                return output
+            factor = pollard_rho(output , max_iterations , batch , attempts)
+            if factor == -1:
+                return output
+            return factor
+    return -1
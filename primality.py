@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 14:41:37 2026
+
+@author: Zhao Yufan
+"""
+"""
+Problem:
+    "Given an integer n, decide whether n is prime."
+
+Every factoring algorithm in this repository needs this after each factor it
+finds, to know whether it should keep splitting. The old test
+(Miller_Rabin_primality_test.py) picks 10 random bases from the operating
+system's random source, which is slow and still only probabilistic. Here:
+
+    1. Trial division by the primes below 1000 settles most numbers (every
+       composite with a small factor) immediately.
+
+    2. The strong probable prime test (Miller-Rabin) to base a:
+       write n - 1 = d * 2**s with d odd. If n is prime, then either
+           a**d = 1 (mod n) , or a**(d * 2**r) = -1 (mod n) for some r < s.
+       A composite n passing this test is a 'strong pseudoprime to base a'.
+       The smallest strong pseudoprime to all the prime bases 2, 3, ..., 41 is
+       above 3.3 * 10**24, so below that bound these 13 bases give a
+       deterministic answer.
+
+    3. Above that bound we use the Baillie-PSW test: a strong probable prime
+       test to base 2, followed by a strong Lucas probable prime test
+       (Selfridge's parameters: the first D in 5, -7, 9, -11, ... with
+       Jacobi symbol (D/n) = -1, P = 1, Q = (1 - D)/4). No composite number
+       is known to pass both.
+
+    4. Results are kept in a bounded LRU cache, since the same cofactors are
+       tested again and again.
+
+SPECIFICATIONS:
+    is_prime(n) -> True or False
+"""
+from functools import lru_cache
+from math import isqrt
+from prime_sieve import primes_up_to
+
+small_primes = primes_up_to(1000)
+
+#the first 13 primes are enough for n below this bound
+deterministic_bound = 3317044064679887385961981
+deterministic_bases = (2 , 3 , 5 , 7 , 11 , 13 , 17 , 19 , 23 , 29 , 31 , 37 , 41)
+
+def strong_probable_prime(n , base):
+    d = n - 1
+    s = 0
+    while d % 2 == 0:
+        d = d // 2
+        s = s + 1
+
+    x = pow(base , d , n)
+    if x == 1 or x == n - 1:
+        return True
+    for _ in range(s - 1):
+        x = (x * x) % n
+        if x == n - 1:
+            return True
+    return False
+
+def jacobi(a , n):
+    assert n > 0 and n % 2 == 1
+    a = a % n
+    result = 1
+    while a != 0:
+        while a % 2 == 0:
+            a = a // 2
+            if n % 8 in (3 , 5):
+                result = -result
+        a , n = n , a
+        if a % 4 == 3 and n % 4 == 3:
+            result = -result
+        a = a % n
+    if n == 1:
+        return result
+    return 0
+
+def lucas_strong_probable_prime(n):
+    #perfect squares have no D with (D/n) = -1
+    if isqrt(n)**2 == n:
+        return False
+    D = 5
+    while jacobi(D , n) != -1:
+        if jacobi(D , n) == 0 and abs(D) != n:
+            return False
+        D = -D - 2 if D > 0 else -D + 2
+    P = 1
+    Q = (1 - D) // 4
+
+    #n + 1 = d * 2**s with d odd
+    d = n + 1
+    s = 0
+    while d % 2 == 0:
+        d = d // 2
+        s = s + 1
+
+    #U_k , V_k , Q**k for k = d, by binary expansion (most significant bit first)
+    inverse_2 = (n + 1) // 2
+    U , V , Q_k = 1 , P , Q % n
+    for bit in bin(d)[3:]:
+        U , V = (U * V) % n , (V * V - 2 * Q_k) % n
+        Q_k = (Q_k * Q_k) % n
+        if bit == '1':
+            U , V = ((P * U + V) * inverse_2) % n , ((D * U + P * V) * inverse_2) % n
+            Q_k = (Q_k * Q) % n
+
+    if U == 0 or V == 0:
+        return True
+    for _ in range(s - 1):
+        V = (V * V - 2 * Q_k) % n
+        Q_k = (Q_k * Q_k) % n
+        if V == 0:
+            return True
+    return False
+
+def strong_tests(n):
+    #for n > 1000**2 without prime factors below 1000
+    if n < deterministic_bound:
+        for base in deterministic_bases:
+            if not strong_probable_prime(n , base):
+                return False
+        return True
+
+    return strong_probable_prime(n , 2) and lucas_strong_probable_prime(n)
+
+@lru_cache(maxsize = 2**16)
+def is_prime(n):
+    if n < 2:
+        return False
+    for prime in small_primes:
+        if n % prime == 0:
+            return n == prime
+    if n < 1000**2:
+        return True
+    return strong_tests(n)
+
+"""
+Batch testing
+
+Factoring pipelines often test thousands of cofactors at once. Rather than
+trial dividing every number by every small prime:
+
+    1. Most numbers have a factor below 25, which a single gcd with the
+       product of those primes finds. For the rest of the chunk, let P be
+       the product of the primes below 1000: P mod n for every n comes out
+       of a single remainder tree (product_tree.py), and n has a small
+       factor exactly when gcd(P mod n , n) > 1.
+    2. The numbers without a small factor go straight to the strong probable
+       prime tests (strong_tests), optionally spread over a process pool.
+
+are_prime_stream is a generator, which works through the input one chunk at
+a time and yields the answers in input order (so the input can be a
+generator too). are_prime returns them all as a list.
+"""
+import multiprocessing
+from math import gcd
+from product_tree import product , product_tree , remainder_tree
+
+small_primes_product = product(small_primes)
+tiny_primes = (2 , 3 , 5 , 7 , 11 , 13 , 17 , 19 , 23)
+tiny_primes_product = product(tiny_primes)
+
+def small_factor_filter(chunk):
+    #for every n: False if it is composite (or < 2), True if it is prime, None if undecided
+    verdicts = []
+    remaining = []
+    for n in chunk:
+        #most numbers have a tiny factor, which one gcd finds right away
+        if n < 2:
+            verdicts.append(False)
+        elif gcd(n , tiny_primes_product) > 1:
+            verdicts.append(n in tiny_primes)
+        else:
+            verdicts.append(None)
+            remaining.append(n)
+    if remaining == []:
+        return verdicts
+    
+    remainders = iter(remainder_tree(small_primes_product , product_tree(remaining)))
+    for i in range(len(chunk)):
+        if verdicts[i] is not None:
+            continue
+        n = chunk[i]
+        if gcd(next(remainders) , n) > 1:
+            verdicts[i] = n <= small_primes[-1] and n in small_primes
+        elif n < 1000**2:
+            verdicts[i] = True
+    return verdicts
+
+def are_prime_stream(numbers , workers = 1 , chunk_size = 1024):
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    pool = multiprocessing.Pool(workers) if workers != 1 else None
+    try:
+        iterator = iter(numbers)
+        while True:
+            chunk = []
+            for n in iterator:
+                chunk.append(n)
+                if len(chunk) == chunk_size:
+                    break
+            if chunk == []:
+                return
+            
+            verdicts = small_factor_filter(chunk)
+            undecided = [n for n , verdict in zip(chunk , verdicts) if verdict is None]
+            if pool is None:
+                results = iter([strong_tests(n) for n in undecided])
+            else:
+                results = pool.imap(strong_tests , undecided , max(len(undecided) // (4 * workers) , 1))
+            for verdict in verdicts:
+                yield next(results) if verdict is None else verdict
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+def are_prime(numbers , workers = 1 , chunk_size = 1024):
+    return list(are_prime_stream(numbers , workers , chunk_size))
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 10:12:44 2026
+
+@author: Zhao Yufan
+"""
+"""
+Every algorithm in this repository needs a list of small primes:
+    - Lenstra's Elliptic Curve Method multiplies points by all primes up to a bound.
+    - The Rational and Quadratic Sieves need a factor base of primes up to B.
+
+Previously each file had its own copy of the Sieve of Eratosthenes, which
+allocates a list of n+1 booleans and is re-run every time it is called.
+This file replaces them with a single shared implementation:
+
+    1. Only odd numbers are stored (2 is the only even prime), and they are
+       stored in a bytearray, 1 byte per odd number instead of a Python object.
+
+    2. The sieve is 'segmented': we sieve a block of 'segment_size' odd numbers
+       at a time, so memory is proportional to the segment size and not to
+       the bound.
+
+    3. primes_between(low , high) is a lazy generator over an arbitrary range.
+       If high is None, it never stops.
+
+    4. primes_up_to(n) keeps a cache keyed by n, so asking for the same bound
+       again (the same B1 for every curve, or the same factor base bound) is free.
+
+    5. stage1_multiplier(bound) = lcm(1 , ... , bound) and stage2_giant_step,
+       which ECM (LenstraEC.py) and Pollard's p-1 and p+1 (pollard_pm1.py)
+       both need. Keeping them here means neither has to import the other.
+"""
+import itertools
+from functools import lru_cache
+from math import isqrt
+
+"""
+The classic (odd-only) Sieve of Eratosthenes. We only use it for the 'base'
+primes up to sqrt(high), which are needed to sieve each segment.
+
+Index i of the bytearray represents the odd number 2*i + 1.
+"""
+
+def simple_sieve(n):
+    if n < 2:
+        return []
+
+    is_prime = bytearray([1]) * ((n + 1)//2)
+    is_prime[0] = 0 #1 is not prime
+    for i in range(1 , (isqrt(n) + 1)//2):
+        if is_prime[i]:
+            p = 2*i + 1
+            #cross out p*p , p*p + 2p , p*p + 4p , ...
+            is_prime[(p*p)//2 :: p] = bytes(len(range((p*p)//2 , len(is_prime) , p)))
+
+    return [2] + [2*i + 1 for i in itertools.compress(range(len(is_prime)) , is_prime)]
+
+"""
+The segmented sieve.
+
+    1. Handle the prime 2 separately.
+    2. Walk over the odd numbers from low to high, 'segment_size' at a time.
+       Index i of the segment represents the odd number start + 2*i.
+    3. For each odd base prime p <= sqrt(end of segment), cross out the odd
+       multiples of p inside the segment, starting from max(p*p , first multiple).
+    4. Whatever is left in the segment is prime.
+"""
+
+def primes_between(low , high = None , segment_size = 2**16):
+    if low <= 2 and (high is None or high >= 2):
+        yield 2
+
+    start = max(low , 3) | 1 #first odd number >= max(low , 3)
+    base_primes , base_limit = [] , 0
+
+    while high is None or start <= high:
+        end = start + 2*segment_size
+        if high is not None:
+            end = min(end , high + 1)
+        size = (end - start + 1)//2
+
+        if isqrt(end) > base_limit:
+            base_limit = max(2*base_limit , isqrt(end))
+            base_primes = simple_sieve(base_limit)
+
+        segment = bytearray([1]) * size
+        for p in base_primes[1:]:
+            if p*p >= end:
+                break
+            first = max(p*p , ((start + p - 1)//p)*p)
+            if first % 2 == 0:
+                first = first + p
+            index = (first - start)//2
+            segment[index :: p] = bytes(len(range(index , size , p)))
+
+        for i in itertools.compress(range(size) , segment):
+            yield start + 2*i
+
+        start = end if end % 2 == 1 else end + 1
+
+"""
+primes_up_to(n) returns all primes <= n. The result is cached, and returned
+as a tuple so that callers sharing the cached value cannot modify it.
+"""
+
+@lru_cache(maxsize = 32)
+def primes_up_to(n):
+    return tuple(primes_between(2 , n))
+
+"""
+Choosing the multiplier K for stage 1.
+
+If the order of P over Z/pZ divides K, then KP is the point at infinity over
+Z/pZ. We want K to be divisible by every 'bound'-smooth number we can afford,
+so we take the product of the largest power of each prime that is <= bound:
+    K = 2**e2 * 3**e3 * 5**e5 * ... = lcm(1 , 2 , 3 , ... , bound)
+Multiplying by K once performs the minimum number of group operations
+(about 1.44*bound doublings), and also catches orders divisible by prime powers.
+
+K only depends on the bound, so we cache it across curves and calls.
+It is shared by Lenstra's ECM (LenstraEC.py) and Pollard's p-1 and p+1
+(pollard_pm1.py).
+"""
+
+@lru_cache(maxsize = 16)
+def stage1_multiplier(bound):
+    K = 1
+    for prime in primes_up_to(bound):
+        prime_power = prime
+        while prime_power * prime <= bound:
+            prime_power = prime_power * prime
+        K = K * prime_power
+    return K
+
+"""
+The giant step D for the baby-step giant-step stage 2 of ECM and of p-1/p+1:
+the largest of 30, 210, 2310, 30030 (products of the first primes, so that
+few j < D/2 are coprime to D) with D**2 <= B2 and D <= 2*bound.
+"""
+
+def stage2_giant_step(bound , B2):
+    D = 6
+    for candidate in (30 , 210 , 2310 , 30030):
+        if candidate**2 <= B2 and candidate <= 2*bound:
+            D = candidate
+    return D
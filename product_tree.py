@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 13:26:05 2026
+
+@author: Zhao Yufan
+"""
+"""
+Product and remainder trees.
+
+Multiplying a long list of integers one by one is slow: the running product
+keeps growing, and every step multiplies a huge number by a small one.
+Multiplying them in pairs, then the pairs in pairs, and so on, keeps both
+operands of every multiplication about the same size, which is where
+Python's (Karatsuba) multiplication is fastest.
+
+    1. product_tree(values) returns the levels of the tree: level 0 is the
+       list of values, level k+1 holds the products of adjacent pairs of
+       level k, and the last level holds the product of everything.
+       With a modulus m, every product is reduced mod m (nothing but the
+       product itself is of any use then).
+
+    2. remainder_tree(x , tree) goes back down a (non-reduced) product tree:
+       x mod (product at a node) is reduced mod the products of its two
+       children. At the bottom this gives x mod every value, at the cost of
+       a few big divisions instead of one division per value.
+
+SPECIFICATIONS:
+    product_tree(values , m = None) -> list of levels
+    product(values , m = None) -> product of values (mod m)
+    remainder_tree(x , tree) -> [x mod value for value in tree[0]]
+"""
+
+def product_tree(values , m = None):
+    tree = [list(values)]
+    if tree[0] == []:
+        return [[1]]
+    while len(tree[-1]) > 1:
+        level = tree[-1]
+        next_level = []
+        for i in range(0 , len(level) - 1 , 2):
+            if m is None:
+                next_level.append(level[i] * level[i + 1])
+            else:
+                next_level.append((level[i] * level[i + 1]) % m)
+        if len(level) % 2 == 1:
+            next_level.append(level[-1])
+        tree.append(next_level)
+    return tree
+
+def product(values , m = None):
+    result = product_tree(values , m)[-1][0]
+    if m is not None:
+        result = result % m
+    return result
+
+def remainder_tree(x , tree):
+    remainders = [x % tree[-1][0]]
+    for level in reversed(tree[:-1]):
+        remainders = [remainders[i // 2] % level[i] for i in range(len(level))]
+    return remainders
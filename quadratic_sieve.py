@@ -97,14 +97,18 @@ def rep_square_to_1(x , p):
 
 def mod_p_sqrt(n , p):
     
+    if p == 2: #every integer is its own square root mod 2
+        return n % 2
+    
     assert legendre(n , p) == 1 , ('n is not a quadratic residue modulo p')
     
     z = 1
     while legendre(z , p) == 1:
         z = z+1
-        
-    S = int( log(extract2(p-1) , 2) )
-    Q = (p-1)//(extract2(p-1)) 
+    
+    #write p-1 = Q * 2**S with Q odd (extract2 returns the exponent S)
+    S = extract2(p-1)
+    Q = (p-1) >> S
     M = S
     c = pow(z , Q , p)
     t = pow(n , Q , p)
@@ -131,71 +135,18 @@ The third step is to implement a function to do gaussian elimination on a matrix
 over GF(2). 
 
 Input: A matrix (not necessarily square) with entries in GF(2).
-Output: An element of the null space.
+Output: The elements of the null space.
 
-This algorithm is taken from:
-    
-https://www.cs.umd.edu/~gasarch/TOPICS/factoring/fastgauss.pdf
+The rows of the matrix are stored bit-packed (one Python integer per row) and
+eliminated with XOR, see null_space in gf2_linear_algebra.py. It returns a
+basis of the null space all at once, as lists of row indices.
+
+Before that, find_dependencies removes relations that cannot be part of a
+solution and merges others (filtering). It can also use Block Lanczos on the
+sparse matrix instead of Gaussian elimination, which saves memory but is
+slower at the sizes we reach here.
 """
-from copy import deepcopy
-def ge_gf2(M): #M is a matrix over GF(2)
-    #no. of rows = n
-    #no. of columns = m
-    temp = deepcopy(M)
-    rows = len(temp)
-    cols = len(temp[0])
-    row_marking = [False]*rows
-    assert cols <= rows
-    #print(temp)
-    for j in range(cols): # for each column:
-        #search for A_ij = 1 in column j
-        for i in range(rows):
-            if temp[i][j] == 1:
-                #temp1 = (i,j)
-                row_marking[i] = True
-                #print(row_marking)
-                for k in range(cols):
-                    if k == j:
-                        continue
-                    
-                    if temp[i][k] == 1: 
-                        #add column j to column k, iterate over rows
-                        for count in range(rows):
-                            temp[count][k] = (temp[count][j] + temp[count][k])%2
-                    
-                break
-        #print(temp)
-            
-    solutions = []
-    for count in range(rows):
-        if row_marking[count] == False:
-            free_row = [temp[count],count]
-            solutions.append(free_row)
-    
-    if solutions == []:
-        return 'No solution found. Consider the smoothness bound B.'
-    
-    #print("Found {} potential solutions.".format(len(solutions)))
-    return solutions , row_marking , temp , M
-                    
-                
-def solve_row(solutions,temp,row_marking,K=0):
-    solution_vec, indices = [],[]
-    free_row = solutions[K][0] # may be multiple K
-    for i in range(len(free_row)):
-        if free_row[i] == 1: 
-            indices.append(i)
-    
-    for r in range(len(temp)): #rows with 1 in the same column will be dependent
-        for i in indices:
-            if temp[r][i] == 1 and row_marking[r]:
-                solution_vec.append(r)
-                break
-            
-  
-    solution_vec.append(solutions[K][1])       
-    #print("Found linear dependencies at rows "+ str(solution_vec))   
-    return solution_vec
+from gf2_linear_algebra import find_dependencies
 """
 We need to improve our factoring algorithm. Naive factorization is not sufficient
 here, because we aim to factorize larger numbers with the quadratic sieve 
@@ -203,12 +154,19 @@ compared to the rational sieve. To do this, we will use extract2, extract3, and
 Lenstra's Elliptic Curve Method implemented earlier. We also use the
 Miller Rabin Primality Test.
 
+ECM is given 'attempts' tries, with the bound doubled every time. If it
+still finds nothing, we try a long Pollard rho run and then trial division up
+to 2**20, and give up with {-1:0} if that fails too.
+
 """
 import math
 import LenstraEC
-from MillerRabinPrimalityTest import MillerRabin
+from prime_sieve import primes_up_to
+from primality import is_prime
+from pollard_rho import pollard_rho
+from trial_division import trial_division
 
-def prime_factors(number):
+def prime_factors(number , attempts = 4):
     n = number
     prime_factors = {}
     bound= 20000
@@ -227,29 +185,31 @@ def prime_factors(number):
     if n == 1:
         return prime_factors
     
-    primality = MillerRabin(n)
-    
-
-    while primality is False:
-        factor = LenstraEC.lenstra(n , bound , curves)
-        if factor != -1:
+    #numbers still to be factored; rho may return a composite factor it could not split
+    remaining = [n]
+    while remaining != []:
+        n = remaining.pop()
+        if is_prime(n):
             try:
-                prime_factors[factor] = prime_factors[factor]+1
-                n = n//factor
+                prime_factors[n] = prime_factors[n]+1
             except KeyError:
-                prime_factors[factor] = 1
-                n = n//factor
-            
-            primality = MillerRabin(n)
-    
-    if (primality is False) and (factor == -1):
-        return {-1:0}
-    
-    elif primality is True:
-        try:
-            prime_factors[n] = prime_factors[n]+1
-        except KeyError:
-            prime_factors[n] = 1
+                prime_factors[n] = 1
+            continue
+        
+        #Pollard rho is cheapest for small factors, ECM takes over if it gives up
+        factor = pollard_rho(n , max_iterations = 2**16)
+        tries = 0
+        while factor == -1 and tries < attempts:
+            factor = LenstraEC.lenstra(n , bound * 2**tries , curves)
+            tries = tries + 1
+        if factor == -1:
+            factor = pollard_rho(n , max_iterations = 2**20)
+        if factor == -1:
+            small , _ = trial_division(n , 2**20)
+            if small == {} or min(small) == n:
+                return {-1:0}
+            factor = min(small)
+        remaining.extend([factor , n//factor])
 
     return prime_factors
 
@@ -272,7 +232,8 @@ we now implement the QS algorithm. The basic idea is as follows:
            (x - floor(sqrt(n)))**2 = n (mod p)
        so n is a quadratic residue mod p. We can therefore throw out primes
        that are not (from the list produced by the Sieve of Eratosthenes)
-    4. Calculate x**2 - n (mod n) for multiple values x, and factorise the results.
+    4. Sieve the values x**2 - n over intervals of x to find the ones that are
+       (likely to be) B-smooth, and factorise only those by trial division.
     5. Collect the results. These are our relations
     6. Use linear algebra to find a product of relations that result in a
        congruence of squares.
@@ -291,7 +252,12 @@ def pnt(n):
     return ceil(n/log(n))
 
 def bound(n):
-    return floor(2*e**(sqrt( log(n)*log(log(n)) / 4 )))
+    #below 100 the factor base has too few primes to ever collect enough relations
+    return max(floor(2*e**(sqrt( log(n)*log(log(n)) / 4 ))) , 100)
+
+def sieve_interval(n):
+    #about sqrt(n) for small n, so that the values x**2 - n stay small
+    return min(65536 , max(2**10 , 2**(n.bit_length() // 2)))
 
 def poly_gen_2():
     return 1 , 0 , 0
@@ -303,46 +269,662 @@ def get_factor_base(n, prime_set):
             factor_base.append(prime)
     return factor_base
 
-def build_relations(n , B , dimension):
-    relations = []
-    count = 0
-    start_value = floor(sqrt(n))
-    #print(start_value)
-    while len(relations) < dimension:
-        #print(relations)
-        count = count + 1
+"""
+Sieving for relations.
+
+Factoring every value Q(x) = x**2 - n (with Lenstra or otherwise) is far too
+slow, and almost all of the values are not B-smooth anyway. Instead we sieve:
+
+    1. For each prime p in the factor base, n is a quadratic residue mod p, so
+       x**2 = n (mod p) has two solutions +r and -r (only one for p = 2).
+       p divides Q(x) exactly when x = +r or x = -r (mod p). (sieve_roots)
+    2. Take an interval of 'interval' consecutive values of x. Start with an
+       array of zeros, and for each prime p, add log2(p) to every position
+       x = +r or -r (mod p). This only needs one addition per hit, no division.
+    3. A position whose total is close to log2(Q(x)) is likely to be B-smooth.
+       Only these candidates are trial divided by the factor base (trial_divide).
+       3a. We skip sieving with the smallest primes (they cost the most
+           additions but contribute the least), and lower the threshold to
+           account for them and for prime powers that were only counted once.
+    4. Move on to the next interval until we have enough relations, or until
+       max_idle intervals in a row gave no new relation (for small n, the
+       smooth values can run out). quadratic_sieve then falls back to rho.
+
+The sums of logs are stored in a bytearray, which is fine as long as
+log2(Q(x)) < 256, i.e. for any n we can hope to factor here.
+"""
+from math import isqrt , log2
+from itertools import compress
+
+def sieve_roots(n , factor_base):
+    roots = {}
+    for prime in factor_base:
+        root = mod_p_sqrt(n % prime , prime)
+        if root == prime - root or prime == 2:
+            roots[prime] = (root ,)
+        else:
+            roots[prime] = (root , prime - root)
+    return roots
+
+def trial_divide(value , factor_base):
+    factors = {}
+    for prime in factor_base:
+        if value % prime == 0:
+            exponent = 0
+            while value % prime == 0:
+                value = value // prime
+                exponent = exponent + 1
+            factors[prime] = exponent
+    return factors , value
 
-        temp1 = (start_value + count)**2 - n
-        #print((temp1, count))
-        temp1_factors = prime_factors(temp1)
-        if temp1_factors == 'error ECM failed':
+"""
+The large prime variation.
+
+Most values that pass the sieve threshold are not B-smooth, but many of them
+are B-smooth apart from one or two 'large' primes that are slightly above B.
+These partial relations are useless on their own, but two partials with the
+same large prime L multiply to a relation where L appears squared, which is
+fine for a congruence of squares.
+
+    1. After trial division, a value leaves a cofactor c.
+       1a. c = 1: a full relation.
+       1b. c < large_prime_bound: c is a prime (it has no factor <= B), a
+           partial relation with one large prime.
+       1c. (large_primes = 2) B**2 < c < B*large_prime_bound: if c is
+           composite, split it into two primes (split_cofactor). If both are
+           below large_prime_bound, a partial with two large primes. Below
+           B**2 the cofactor is always a prime, and larger cofactors are
+           rarely worth the time it takes to split them.
+    2. Think of every large prime as a vertex of a graph, with an extra vertex
+       1. A partial relation with large primes L1 and L2 is an edge between
+       L1 and L2 (or between L1 and 1, if it has a single large prime).
+    3. Whenever a new edge closes a cycle, every large prime on the cycle
+       appears an even number of times in the product of the relations along
+       the cycle. That product is a new full relation (combine_partial).
+       We detect cycles with union-find, and find the edges along the cycle by
+       searching the spanning forest of edges that did not close a cycle.
+
+A combined relation (u , factors) satisfies u**2 = product of factors (mod n).
+Its factors include the large primes, all with even exponents, so they do not
+need a column in the matrix, but they are needed to compute the square root.
+"""
+
+def find_root(parent , vertex):
+    while parent.get(vertex , vertex) != vertex:
+        parent[vertex] = parent.get(parent[vertex] , parent[vertex])
+        vertex = parent[vertex]
+    return vertex
+
+def forest_path(forest , start , end):
+    #breadth first search for the edges (relations) from start to end
+    previous = {start : None}
+    queue = [start]
+    for vertex in queue:
+        if vertex == end:
+            break
+        for neighbour , relation in forest.get(vertex , []):
+            if neighbour not in previous:
+                previous[neighbour] = (vertex , relation)
+                queue.append(neighbour)
+    
+    path = []
+    vertex = end
+    while previous[vertex] is not None:
+        vertex , relation = previous[vertex]
+        path.append(relation)
+    return path
+
+def combine_partial(n , relation , large1 , large2 , partials , relations):
+    parent , forest = partials
+    root1 , root2 = find_root(parent , large1) , find_root(parent , large2)
+    if root1 != root2:
+        parent[root1] = root2
+        forest.setdefault(large1 , []).append((large2 , relation))
+        forest.setdefault(large2 , []).append((large1 , relation))
+        return
+    
+    u , factors = relation[0] % n , dict(relation[1])
+    for other_u , other_factors in forest_path(forest , large1 , large2):
+        u = (u * other_u) % n
+        for prime in other_factors:
+            factors[prime] = factors.get(prime , 0) + other_factors[prime]
+    relations.append((u , factors))
+
+def split_cofactor(cofactor , large_prime_bound):
+    #a base 2 Fermat test is enough to throw away most prime cofactors
+    if pow(2 , cofactor - 1 , cofactor) == 1:
+        return None
+    #both factors are below large_prime_bound, so rho needs about sqrt(large_prime_bound) steps
+    factor = pollard_rho(cofactor , max_iterations = 4 * isqrt(large_prime_bound))
+    if factor == -1:
+        return None
+    factor , other = sorted((factor , cofactor // factor))
+    if other >= large_prime_bound or not is_prime(factor) or not is_prime(other):
+        return None
+    return factor , other
+
+def record_relation(n , u , factors , cofactor , factor_base , large_prime_bound , large_primes , partials , relations ,
+                    checkpoint_file = None):
+    if cofactor == 1:
+        relations.append((u , factors))
+        save_relation(checkpoint_file , u , factors)
+        return
+    if large_primes == 0:
+        return
+    
+    if cofactor < large_prime_bound:
+        large1 , large2 = cofactor , 1
+    elif large_primes == 2 and factor_base[-1]**2 < cofactor < factor_base[-1] * large_prime_bound:
+        split = split_cofactor(cofactor , large_prime_bound)
+        if split is None:
+            return
+        large1 , large2 = split
+    else:
+        return
+    
+    factors = dict(factors)
+    factors[large1] = factors.get(large1 , 0) + 1
+    if large2 != 1:
+        factors[large2] = factors.get(large2 , 0) + 1
+    save_relation(checkpoint_file , u , factors)
+    if large1 == large2:
+        #the cofactor was a square: this is already a full relation
+        relations.append((u , factors))
+        return
+    combine_partial(n , (u , factors) , large1 , large2 , partials , relations)
+
+"""
+Checkpoints
+
+Sieving can take hours, so the relations can be written to a checkpoint file
+as they are found. The file is plain text and append-only:
+
+    # QS n=<n> B=<largest prime> primes=<size of factor base> mode=<mode>
+    <u> <p>:<e>,<p>:<e>,...
+    # sieved <x>
+
+The header keys the file to one n and factor base. Every full relation and
+every partial relation is one line (combined relations are not written, they
+are rebuilt from the partials when the file is read back). '# sieved x' lines
+record that the single polynomial sieve has covered everything below x.
+
+If the file already exists, open_checkpoint reads it back and sieving carries
+on from where it stopped. If it already holds enough relations, nothing is
+sieved at all, so the matrix step can be rerun on its own.
+"""
+import os
+
+def relation_line(u , factors):
+    return '%d %s\n' % (u , ','.join('%d:%d' % (prime , factors[prime]) for prime in factors))
+
+def parse_relation(line):
+    u , text = line.split()
+    factors = {}
+    for item in text.split(','):
+        prime , exponent = item.split(':')
+        factors[int(prime)] = int(exponent)
+    return int(u) , factors
+
+def save_relation(checkpoint_file , u , factors):
+    if checkpoint_file is not None:
+        checkpoint_file.write(relation_line(u , factors))
+        checkpoint_file.flush()
+
+def save_position(checkpoint_file , x):
+    if checkpoint_file is not None:
+        checkpoint_file.write('# sieved %d\n' % x)
+        checkpoint_file.flush()
+
+def open_checkpoint(checkpoint , n , factor_base , mode):
+    #returns the file opened for appending, the relations and partials read
+    #back from it, the values of u already seen and how far the sieve got
+    relations = []
+    partials = ({} , {})
+    seen = set()
+    position = None
+    if checkpoint is None:
+        return None , relations , partials , seen , position
+    
+    header = '# QS n=%d B=%d primes=%d mode=%s\n' % (n , factor_base[-1] , len(factor_base) , mode)
+    lines = []
+    if os.path.exists(checkpoint):
+        with open(checkpoint , 'rb') as checkpoint_file:
+            data = checkpoint_file.read()
+        #the last line may have been cut short by a crash
+        complete = data.rfind(b'\n') + 1
+        if complete < len(data):
+            os.truncate(checkpoint , complete)
+        lines = data[:complete].decode().splitlines()
+    assert lines == [] or lines[0] == header.rstrip() , 'checkpoint file belongs to a different n, factor base or mode'
+    
+    in_base = set(factor_base)
+    for line in lines[1:]:
+        if line.startswith('# sieved'):
+            position = max(position or 0 , int(line.split()[2]))
             continue
+        u , factors = parse_relation(line)
+        seen.add(abs(u))
+        large = [prime for prime in factors if prime not in in_base and prime != -1 and factors[prime] % 2 == 1]
+        if large == []:
+            relations.append((u , factors))
         else:
-            append = True
-            for item in temp1_factors:
-                if item > B:
-                    append = False
+            large.append(1)
+            combine_partial(n , (u , factors) , large[0] , large[1] , partials , relations)
+    
+    checkpoint_file = open(checkpoint , 'a')
+    if lines == []:
+        checkpoint_file.write(header)
+    return checkpoint_file , relations , partials , seen , position
+
+def large_prime_allowance(factor_base , large_primes , large_prime_multiplier):
+    #how much lower the sieve threshold must be to catch partial relations.
+    #the threshold already leaves room for one prime of size about B.
+    if large_primes == 0:
+        return 0
+    allowance = log2(large_prime_multiplier)
+    if large_primes == 2:
+        allowance += log2(factor_base[-1])
+    return allowance
+
+def sieve_threshold(log_Q , factor_base , small_prime_bound):
+    #on average, a prime p with 2 roots contributes 2*log2(p)/(p-1)
+    skipped = sum(2*log2(prime)/(prime - 1) for prime in factor_base if prime < small_prime_bound)
+    return max(int(log_Q - log2(factor_base[-1]) - skipped) , 1)
+
+def sieve_block(n , start_value , factor_base , roots , logs , interval , small_prime_bound , allowance , large_primes):
+    #sieves x in [start_value , start_value + interval), returns (x , factors , cofactor)
+    sieve = bytearray(interval)
+    for prime in factor_base:
+        if prime < small_prime_bound:
+            continue
+        log_p = logs[prime]
+        for root in roots[prime]:
+            for i in range((root - start_value) % prime , interval , prime):
+                sieve[i] = sieve[i] + log_p
+    
+    #Q(x) is largest at the end of the interval
+    log_Q = log2((start_value + interval)**2 - n)
+    threshold = max(int(sieve_threshold(log_Q , factor_base , small_prime_bound) - allowance) , 1)
+    candidates = sieve.translate(bytes([0]*threshold + [1]*(256 - threshold)))
+    
+    found = []
+    for i in compress(range(interval) , candidates):
+        x = start_value + i
+        factors , cofactor = trial_divide(x**2 - n , factor_base)
+        if cofactor != 1 and large_primes == 0:
+            continue
+        found.append((x , factors , cofactor))
+    return found
+
+def build_relations(n , factor_base , dimension , interval = 65536 , small_prime_bound = 20 ,
+                    large_primes = 0 , large_prime_multiplier = 64 , checkpoint = None , max_idle = 2**10):
+    checkpoint_file , relations , partials , seen , position = open_checkpoint(checkpoint , n , factor_base , 'single')
+    #always sieve with at least half of the factor base
+    small_prime_bound = min(small_prime_bound , factor_base[len(factor_base) // 2])
+    large_prime_bound = large_prime_multiplier * factor_base[-1]
+    allowance = large_prime_allowance(factor_base , large_primes , large_prime_multiplier)
+    roots = sieve_roots(n , factor_base)
+    logs = {prime : round(log2(prime)) for prime in factor_base}
+    start_value = isqrt(n) + 1 if position is None else position
+    
+    #give up after max_idle intervals in a row without a new relation
+    idle = 0
+    try:
+        while len(relations) < dimension and idle < max_idle:
+            found = len(relations)
+            for x , factors , cofactor in sieve_block(n , start_value , factor_base , roots , logs , interval ,
+                                                      small_prime_bound , allowance , large_primes):
+                #after a resume, the block in progress is sieved again
+                if x in seen:
+                    continue
+                seen.add(x)
+                record_relation(n , x , factors , cofactor , factor_base , large_prime_bound , large_primes , partials ,
+                                relations , checkpoint_file)
+                if len(relations) >= dimension:
                     break
             
-            if append is True:
-               relations.append((start_value + count,temp1_factors))
+            start_value = start_value + interval
+            idle = idle + 1 if len(relations) == found else 0
+            if len(relations) < dimension:
+                save_position(checkpoint_file , start_value)
+    finally:
+        if checkpoint_file is not None:
+            checkpoint_file.close()
+    
+    return relations[:dimension]
+
+"""
+Self-initializing multiple polynomial Quadratic Sieve (SIQS)
+
+With the single polynomial Q(x) = x**2 - n, the values grow linearly with the
+distance of x from sqrt(n), and become less and less likely to be B-smooth
+the longer we sieve. Instead, we switch between many polynomials
+
+    Q(x) = (a*x + b)**2 - n ,  x in [-M , M)
+
+where b**2 = n (mod a). Then Q(x) = a * g(x), with
+    g(x) = a*x**2 + 2*b*x + c ,  c = (b**2 - n)/a
+and if a is close to sqrt(2n)/M, |g(x)| stays below about M*sqrt(n/2) on the
+whole interval. We sieve g(x) instead of Q(x), and each smooth g(x) gives the
+relation (a*x + b)**2 = a*g(x) (mod n).
+
+    1. Choosing a (siqs_choose_a): a is the product of s factor base primes
+       q_1, ..., q_s, so that a is as close to sqrt(2n)/M as possible.
+       
+    2. Choosing b: for each q_l, let t_l be the square root of n mod q_l, and
+           B_l = (a/q_l) * (t_l * (a/q_l)**-1 mod q_l)
+       Then every b = +-B_1 +- B_2 +- ... +- B_s satisfies b**2 = n (mod a).
+       This gives 2**(s-1) different polynomials for the same a
+       (b and -b give the same values).
+       
+    3. Self-initialization (siqs_first_polynomial, siqs_next_polynomial):
+       The sieve roots of g(x) mod p are (a**-1)*(+-t_p - b) mod p.
+       If we walk through the b's in Gray code order, consecutive b's differ
+       in a single term: b' = b + 2*e*B_v with e = +-1. The roots then change by
+           -e * (2 * B_v * a**-1 mod p)
+       which we precompute once per a. So switching to the next polynomial
+       costs one addition per prime, and no modular inversions.
+       
+    4. Values of g(x) can be negative, so -1 is added to the factor base as
+       an extra 'prime'. Since a only contains factor base primes, a relation
+       (a*x + b , factors of a*g(x)) is B-smooth whenever g(x) is.
+"""
+import random
+
+def siqs_choose_a(factor_base , target , used_a , small_prime_bound):
+    for s in range(1 , 20):
+        ideal = target ** (1/s)
+        if ideal > 4000 and s < 19:
+            continue
+        pool = [prime for prime in factor_base 
+                if prime > small_prime_bound and ideal/2 <= prime <= 2*ideal]
+        if len(pool) < s + 2:
+            continue
+        
+        for _ in range(100):
+            a_factors = random.sample(pool , s - 1)
+            a = 1
+            for prime in a_factors:
+                a = a * prime
+            rest = [prime for prime in pool if prime not in a_factors]
+            last = min(rest , key = lambda prime : abs(a * prime - target))
+            a_factors.append(last)
+            a = a * last
+            if a not in used_a:
+                used_a.add(a)
+                return a , sorted(a_factors)
+    
+    return None , None
+
+def siqs_first_polynomial(n , a , a_factors , factor_base , roots , M):
+    B_terms = []
+    for q in a_factors:
+        a_over_q = a // q
+        gamma = (roots[q][0] * pow(a_over_q , -1 , q)) % q
+        if gamma > q // 2:
+            gamma = q - gamma
+        B_terms.append(a_over_q * gamma)
+    b = sum(B_terms)
+    
+    solutions = {}
+    B_a_inverse = {}
+    for prime in factor_base:
+        if a % prime == 0:
+            continue
+        a_inverse = pow(a , -1 , prime)
+        #roots of g(x), shifted so that index 0 of the sieve is x = -M
+        solutions[prime] = [(a_inverse * (root - b) + M) % prime for root in roots[prime]]
+        B_a_inverse[prime] = [(2 * term * a_inverse) % prime for term in B_terms]
+    
+    return b , B_terms , solutions , B_a_inverse
+
+def siqs_next_polynomial(i , b , B_terms , solutions , B_a_inverse):
+    #the i-th step of the Gray code flips the sign of B_(v+1), where v is the
+    #position of the lowest set bit of i (B_0 keeps its sign: b and -b are
+    #the same polynomial). Bit v of the previous Gray code tells us whether
+    #B_(v+1) is currently added (0) or subtracted (1).
+    v = (i & -i).bit_length() - 1
+    previous_gray = (i - 1) ^ ((i - 1) >> 1)
+    e = -1 if ((previous_gray >> v) & 1) == 0 else 1
+    b = b + 2 * e * B_terms[v + 1]
+    for prime in solutions:
+        change = e * B_a_inverse[prime][v + 1]
+        solutions[prime] = [(root - change) % prime for root in solutions[prime]]
+    return b
+
+def siqs_sieve(n , a , b , solutions , factor_base , logs , M , small_prime_bound , allowance , large_primes):
+    #returns (u , factors , cofactor) with u = a*x + b for the candidates in [-M , M)
+    sieve = bytearray(2*M)
+    for prime in solutions:
+        if prime < small_prime_bound:
+            continue
+        log_p = logs[prime]
+        for root in solutions[prime]:
+            for i in range(root , 2*M , prime):
+                sieve[i] = sieve[i] + log_p
+    
+    c = (b*b - n) // a
+    log_g = log2(M * isqrt(n) + 1)
+    threshold = max(int(sieve_threshold(log_g , factor_base , small_prime_bound) - allowance) , 1)
+    candidates = sieve.translate(bytes([0]*threshold + [1]*(256 - threshold)))
+    
+    found = []
+    for i in compress(range(2*M) , candidates):
+        x = i - M
+        g = a*x*x + 2*b*x + c
+        u = a*x + b
+        if g == 0:
+            continue
+        factors , cofactor = trial_divide(abs(g) , factor_base)
+        if cofactor != 1 and large_primes == 0:
+            continue
+        
+        #a*g(x) = u**2 - n, so add the prime factors of a
+        a_temp = a
+        for prime in factor_base:
+            if a_temp % prime == 0:
+                a_temp = a_temp // prime
+                factors[prime] = factors.get(prime , 0) + 1
+        if g < 0:
+            factors[-1] = 1
+        found.append((u , factors , cofactor))
+    return found
+
+def build_relations_siqs(n , factor_base , dimension , interval = 65536 , small_prime_bound = 20 ,
+                         large_primes = 0 , large_prime_multiplier = 64 , checkpoint = None , max_idle = 2**10):
+    M = interval // 2
+    small_prime_bound = min(small_prime_bound , factor_base[len(factor_base) // 2])
+    target = isqrt(2*n) // M
+    used_a = set()
+    if siqs_choose_a(factor_base , target , set() , small_prime_bound)[0] is None:
+        #n is too small to build polynomials, go back to x**2 - n
+        return build_relations(n , factor_base , dimension , interval , small_prime_bound ,
+                               large_primes , large_prime_multiplier , checkpoint , max_idle)
+    
+    checkpoint_file , relations , partials , seen , position = open_checkpoint(checkpoint , n , factor_base , 'siqs')
+    large_prime_bound = large_prime_multiplier * factor_base[-1]
+    allowance = large_prime_allowance(factor_base , large_primes , large_prime_multiplier)
+    roots = sieve_roots(n , factor_base)
+    logs = {prime : round(log2(prime)) for prime in factor_base}
+    
+    #give up after max_idle polynomials in a row without a new relation
+    idle = 0
+    try:
+        while len(relations) < dimension and idle < max_idle:
+            a , a_factors = siqs_choose_a(factor_base , target , used_a , small_prime_bound)
+            if a is None:
+                break
+            
+            b , B_terms , solutions , B_a_inverse = siqs_first_polynomial(n , a , a_factors , factor_base , roots , M)
+            for i in range(1 , 2**(len(a_factors) - 1) + 1):
+                found = len(relations)
+                for u , factors , cofactor in siqs_sieve(n , a , b , solutions , factor_base , logs , M ,
+                                                         small_prime_bound , allowance , large_primes):
+                    #u and -u give the same relation
+                    if abs(u) in seen:
+                        continue
+                    seen.add(abs(u))
+                    record_relation(n , u , factors , cofactor , factor_base , large_prime_bound , large_primes , partials ,
+                                    relations , checkpoint_file)
+                idle = idle + 1 if len(relations) == found else 0
+                if len(relations) >= dimension or idle >= max_idle or i == 2**(len(a_factors) - 1):
+                    break
+                b = siqs_next_polynomial(i , b , B_terms , solutions , B_a_inverse)
+    finally:
+        if checkpoint_file is not None:
+            checkpoint_file.close()
+    
+    return relations[:dimension]
+
+"""
+Parallel sieving
+
+Sieving is by far the most expensive step, and every interval (or every SIQS
+polynomial) can be sieved independently of the others.
+
+    1. Each worker process (sieve_worker) sieves its own share of the work:
+       in 'single' mode worker w of W sieves the intervals w, w + W, w + 2W, ...
+       above sqrt(n). In 'siqs' mode the collector chooses the values of a
+       and hands them out over a task queue, a few ahead of the workers, so
+       no two workers sieve the same polynomial and none of them sits idle.
+    2. The candidates (u , factors , cofactor) found in each interval are sent
+       back over a queue to the collector (build_relations_parallel), which
+       removes duplicates, combines the partial relations (this has to happen
+       in one place, since cycles of large primes cross workers) and keeps
+       count of the relations.
+    3. Once there are enough relations, the collector sets the stop event
+       and shuts the workers down. As in build_relations, it also stops
+       after max_idle intervals (or polynomials) in a row without a new
+       relation, and when every worker process has exited, whether or not
+       it said goodbye on the queue (a worker that crashes cannot).
+"""
+import multiprocessing
+from queue import Empty
+
+def sieve_worker(n , factor_base , mode , worker , workers , start_value , interval , small_prime_bound ,
+                 allowance , large_primes , queue , tasks , stop):
+    #puts (start of the interval , candidates) on the queue, with None as the start for SIQS
+    roots = sieve_roots(n , factor_base)
+    logs = {prime : round(log2(prime)) for prime in factor_base}
+    
+    if mode == 'single':
+        start_value = start_value + worker * interval
+        while not stop.is_set():
+            queue.put((start_value , sieve_block(n , start_value , factor_base , roots , logs , interval ,
+                                                 small_prime_bound , allowance , large_primes)))
+            start_value = start_value + workers * interval
+        return
+    
+    M = interval // 2
+    while not stop.is_set():
+        a , a_factors = tasks.get()
+        if a is None:
+            queue.put((None , None))
+            return
+        
+        b , B_terms , solutions , B_a_inverse = siqs_first_polynomial(n , a , a_factors , factor_base , roots , M)
+        for i in range(1 , 2**(len(a_factors) - 1) + 1):
+            queue.put((None , siqs_sieve(n , a , b , solutions , factor_base , logs , M ,
+                                         small_prime_bound , allowance , large_primes)))
+            if stop.is_set() or i == 2**(len(a_factors) - 1):
+                break
+            b = siqs_next_polynomial(i , b , B_terms , solutions , B_a_inverse)
+
+def build_relations_parallel(n , factor_base , dimension , mode = 'single' , workers = None , interval = 65536 ,
+                             small_prime_bound = 20 , large_primes = 0 , large_prime_multiplier = 64 , verbose = False ,
+                             checkpoint = None , max_idle = 2**10):
+    assert mode in ('single' , 'siqs') , 'unknown mode'
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    small_prime_bound = min(small_prime_bound , factor_base[len(factor_base) // 2])
+    if mode == 'siqs' and siqs_choose_a(factor_base , isqrt(2*n) // (interval // 2) , set() , small_prime_bound)[0] is None:
+        #n is too small to build polynomials, go back to x**2 - n
+        mode = 'single'
+    
+    checkpoint_file , relations , partials , seen , position = open_checkpoint(checkpoint , n , factor_base , mode)
+    if position is None:
+        position = isqrt(n) + 1
+    large_prime_bound = large_prime_multiplier * factor_base[-1]
+    allowance = large_prime_allowance(factor_base , large_primes , large_prime_multiplier)
+    queue = multiprocessing.Queue()
+    tasks = multiprocessing.Queue()
+    stop = multiprocessing.Event()
+    processes = [multiprocessing.Process(target = sieve_worker ,
+                                         args = (n , factor_base , mode , worker , workers , position , interval ,
+                                                 small_prime_bound , allowance , large_primes , queue , tasks , stop) ,
+                                         daemon = True)
+                 for worker in range(workers)]
+    
+    #SIQS: polynomials handed out but not sieved yet, kept at about two values of a per worker
+    target = isqrt(2*n) // (interval // 2)
+    used_a = set()
+    pending = 0
+    polynomials_per_a = 1
+    out_of_a = mode != 'siqs'
+    
+    #intervals are finished out of order, the checkpoint only records how far
+    #every interval below has been sieved
+    finished = set()
+    running = workers
+    idle = 0
+    try:
+        if len(relations) < dimension:
+            for process in processes:
+                process.start()
         
-    return relations
-
-def mod_mul(a, b, mod):
- 
-    res = 0
-    a = a % mod
- 
-    while (b):
-     
-        if (b & 1):
-            res = (res + a) % mod
-             
-        a = (2 * a) % mod
- 
-        b >>= 1
-    return res
+        while len(relations) < dimension and running > 0 and idle < max_idle:
+            while not out_of_a and pending < 2 * workers * polynomials_per_a:
+                a , a_factors = siqs_choose_a(factor_base , target , used_a , small_prime_bound)
+                if a is None:
+                    #tell every worker to stop once the queue is empty
+                    out_of_a = True
+                    for _ in range(workers):
+                        tasks.put((None , None))
+                    break
+                tasks.put((a , a_factors))
+                polynomials_per_a = 2**(len(a_factors) - 1)
+                pending = pending + polynomials_per_a
+            
+            try:
+                start_value , found = queue.get(timeout = 1)
+            except Empty:
+                #workers that died without a word
+                running = min(running , sum(process.is_alive() for process in processes))
+                continue
+            if found is None:
+                #this worker ran out of polynomials
+                running = running - 1
+                continue
+            if mode == 'siqs':
+                pending = pending - 1
+            count = len(relations)
+            for u , factors , cofactor in found:
+                #u and -u give the same relation
+                if abs(u) in seen:
+                    continue
+                seen.add(abs(u))
+                record_relation(n , u , factors , cofactor , factor_base , large_prime_bound , large_primes , partials ,
+                                relations , checkpoint_file)
+            idle = idle + 1 if len(relations) == count else 0
+            if start_value is not None:
+                finished.add(start_value)
+                while position in finished:
+                    finished.remove(position)
+                    position = position + interval
+                    save_position(checkpoint_file , position)
+            if verbose:
+                print('relations:' , len(relations) , '/' , dimension)
+    finally:
+        stop.set()
+        for process in processes:
+            if process.pid is not None:
+                process.terminate()
+                process.join()
+        if checkpoint_file is not None:
+            checkpoint_file.close()
+    
+    return relations[:dimension]
+
 def prime_to_index(factor_base):
     indices = {}
     count = 0
@@ -351,85 +933,132 @@ def prime_to_index(factor_base):
         count = count + 1
     return indices
 
+"""
+Each row of the relation matrix is a relation, and each column a prime of the
+factor base. The entry is the exponent of the prime mod 2. The matrix is
+extremely sparse, so each row is stored as the list of columns with a 1.
+"""
 def build_r_matrix(factor_base , relations):
     
-    dimension = len(factor_base)
-    count = 0
     prime_index = prime_to_index(factor_base)
     r_matrix = []
     for item in relations:
-        temp3 = [0] * dimension
+        columns = []
         for prime in item[1]:
-            temp3[prime_index[prime]] = temp3[prime_index[prime]] + item[1][prime] % 2
-        r_matrix.append(temp3)
-        count = count + 1
+            #large primes (not in the factor base) always have even exponents
+            if item[1][prime] % 2 == 1:
+                columns.append(prime_index[prime])
+        r_matrix.append(sorted(columns))
     
     return r_matrix
 
 
-def quadratic_sieve(n):
+"""
+Every vector in the null space of the relation matrix gives a congruence of
+squares LHS**2 = RHS**2 (mod n), and each one splits n with probability about
+1/2. So instead of sieving again when the first one gives 1 or n, we try the
+dependencies one by one (congruent_squares is a generator, so no work is
+spent on the ones after the first success). A few extra relations beyond the
+size of the factor base guarantee that there are at least that many
+dependencies.
+
+For each dependency:
+    1. LHS is the product of the u's of the relations, mod n. It is computed
+       with a product tree (product_tree.py), reducing mod n at every level.
+    2. The factors of every relation are stored once as two compact arrays
+       (exponent_vectors): the columns of its primes, and their exponents.
+       Adding them up for the relations of the dependency gives the exponent
+       of every prime in the product, and all of them are even.
+    3. RHS is the product of prime**(exponent/2) mod n, again with a product
+       tree. Large primes (outside the factor base) are included.
+"""
+from array import array
+from product_tree import product
+
+def exponent_vectors(relations):
+    primes = sorted({prime for u , factors in relations for prime in factors})
+    index = prime_to_index(primes)
+    vectors = []
+    for u , factors in relations:
+        vectors.append((array('L' , [index[prime] for prime in factors]) , array('L' , factors.values())))
+    return primes , vectors
+
+def congruent_squares(n , relations , dependencies):
+    primes , vectors = exponent_vectors(relations)
+    for solution_vec in dependencies:
+        exponents = array('L' , [0]) * len(primes)
+        for item in solution_vec:
+            indices , powers = vectors[item]
+            for column , power in zip(indices , powers):
+                exponents[column] = exponents[column] + power
+        
+        LHS = product([relations[item][0] for item in solution_vec] , n)
+        RHS = product([pow(primes[column] , exponents[column] // 2 , n)
+                       for column in range(len(primes)) if exponents[column] > 0] , n)
+        yield LHS , RHS
+
+def quadratic_sieve(n , mode = 'single' , large_primes = 1 , workers = 1 , checkpoint = None , extra_relations = 10 ,
+                    verbose = True):
+    assert mode in ('single' , 'siqs') , 'unknown mode'
+    assert large_primes in (0 , 1 , 2) , 'large_primes must be 0, 1 or 2'
     B = bound(n)
-    prime_set = LenstraEC.primes_up_to(B)
+    prime_set = primes_up_to(B)
+    #n must not have a factor in the factor base (legendre needs gcd(n , p) = 1)
+    for prime in prime_set:
+        if n % prime == 0 and prime < n:
+            return prime
     factor_base = get_factor_base(n , prime_set)
     dimension = len(factor_base)
+    interval = sieve_interval(n)
 #start squaring at smallest values
-    print('check 0')
-    relations = build_relations(n , B , dimension)  
-    print('check 1')
-    #keep track of rows in relation_matrix and start_value+counter
-    r_track = {}
-    count = 0
-    for item in relations:
-        r_track[count] = item[0]
-        count = count + 1
+    if verbose:
+        print('check 0')
+    #one more relation than primes guarantees a dependency, every extra
+    #relation adds another one (a small factor base cannot support many)
+    target = dimension + 1 + min(extra_relations , dimension)
+    if workers != 1:
+        #workers = None uses every core
+        relations = build_relations_parallel(n , factor_base , target , mode , workers , interval ,
+                                             large_primes = large_primes , checkpoint = checkpoint)
+    elif mode == 'siqs':
+        relations = build_relations_siqs(n , factor_base , target , interval , large_primes = large_primes ,
+                                         checkpoint = checkpoint)
+    else:
+        relations = build_relations(n , factor_base , target , interval , large_primes = large_primes ,
+                                    checkpoint = checkpoint)
+    if mode == 'siqs':
+        #values of g(x) can be negative, -1 gets its own column
+        factor_base = [-1] + factor_base
+        dimension = dimension + 1
+    if verbose:
+        print('check 1')
     
     #building the matrix
 
     r_matrix = build_r_matrix(factor_base, relations)
     
-    solutions , row_marking , temp , M = ge_gf2(r_matrix)
-    #take sum of rows in solution vec to get linear relation
-    solution_vec = solve_row(solutions , temp , row_marking,K=0)
-    print(solution_vec)
-    
-    LHS = 1
-    RHS = 1
-    #p_output keeps track of exponent of 
-    p_output = [0]*dimension
-    prime_index = prime_to_index(factor_base)
+    dependencies = find_dependencies(r_matrix)
+    if verbose:
+        print(len(dependencies) , 'dependencies')
+    for LHS , RHS in congruent_squares(n , relations , dependencies):
+        factor = gcd(LHS - RHS , n)
+        if 1 < factor < n:
+            return factor
     
-    for item in solution_vec:
-        
-        LHS = mod_mul(LHS, relations[item][0], n)
-        p_tracker = relations[item][1]
-        for prime in p_tracker:
-            p_output[prime_index[prime]] = p_output[prime_index[prime]] + p_tracker[prime]
-    
-    for count in range(len(p_output)):
-        p_output[count] = p_output[count]//2
-        RHS = mod_mul(RHS , pow(factor_base[count] , p_output[count] , n) , n)
-        
-    
-    return gcd(LHS-RHS, n)
+    #the sieve gave up (or every dependency was trivial): fall back to rho
+    factor = pollard_rho(n)
+    if factor != -1 and factor != n:
+        return factor
+    return 'No solution found. Consider the smoothness bound B.'
 
 
 
 #test_value = 140739635773439 # 65537 * 2147483647
 
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+if __name__ == '__main__':
+    #regression test: for these small semiprimes the sieve used to run forever
+    for test_value in (80543 , 5382389 , 17854789):
+        for test_mode in ('single' , 'siqs'):
+            factor = quadratic_sieve(test_value , test_mode , verbose = False)
+            assert isinstance(factor , int) and 1 < factor < test_value and test_value % factor == 0
+            print(test_value , '=' , factor , '*' , test_value // factor)
@@ -22,70 +22,21 @@ The first step implement the Sieve of Eratosthenes algorithm for finding
 prime numbers up to a given bound n (specified by input)
 
 This helper function will be useful for generating one of the parameters used in
-the algorithm.
+the algorithm. It is shared by all the algorithms in this repository, and
+lives in prime_sieve.py (segmented, odd-only, and cached by bound).
 """
 
-def primes_up_to(n):
-    primeCheck = [True]*(n+1) #boolean array indicating if index is prime
-    primeCheck[0] = False
-    primeCheck[1] = False
-    primes = []
-    p = 2
-    
-    while p**2 < n:
-        
-        if (primeCheck[p] is True):
-            for i in range(p**2 , n+1 , p):
-                primeCheck[i] = False
-        
-        for j in range(p+1,n+1):
-            if primeCheck[j] is True:
-                p = j
-                break
-    
-    for k in range(n+1):
-        if primeCheck[k] is True:
-            primes.append(k)
-    
-    return primes
+from prime_sieve import primes_up_to
 
 """
 The second step is to know how to check if a number is 'B-smooth'. 
 A number z is called B-smooth if all its prime factors are less than B.
 
-For this, we need 2 helper functions:
-    1. A function that breaks down a number into its prime factorization (as a list);
-    2. A function to check if all prime factors in that list is less than B.
-    
-for 1, we will use naive_factorzation. Even though this is one of the worst
-factorization algorithms for large n, it is suitable for our purpose here because
-it has the least setup/overhead for small n. Since Rational Sieve itself is not intended
-for large n, naive_factorization works here.
+We do not need the complete factorization of z for this. factor_over (below)
+divides z by every prime of the factor base (the primes up to B) in turn, and
+z is B-smooth exactly when nothing is left over. It also gives the exponents
+we need for the relations.
 """
-
-import math
-
-
-def prime_factors(number):
-    prime_factors = {}
-    t = number
-    i = 2
-    while i < math.isqrt(t) + 1:
-        if t % i == 0:
-            prime_factors[i] = 0
-            while t % i == 0:
-                prime_factors[i] = prime_factors[i] + 1
-                t = t // i
-        i = i+1
-    if t > 1:
-        prime_factors[t] = 1
-    return prime_factors
-                
-
-#B-smooth check
-def is_B_smooth(prime_factors , B):
-    return max(prime_factors) in primes_up_to(B)
-
 """
 The third step is to generate some relations.
 
@@ -93,33 +44,92 @@ We now fix a bound B, and an integer z, such that both z and z+n are B-smooth.
 For Rational Sieve to run smoothly, B cannot be too large.
 The Sieve of Eratosthenes will help us here.
 
-We will then compute the prime factors of z and z+n to generate the relations
+We will then need the prime factors of z and z+n to generate the relations
 we seek.
 
-This step involves factoring z+n, so it somewhat turns into a recursive problem.
-However, since we generally only expect n to be difficult to factorize and we
-have the freedom to choose z, factoring z+n should be an easier task than
-factoring n.
-
-Moreover, we can use other algorithms (Lenstra Elliptic Curves, Naive Factorize),
-so we are not making a circular argument.
-
-However, for the case of the rational sieve, we will simply use naive_factorization.
-Rational sieve is only suitable for small small integers, z+n and z should be small too.
-naive_factorization in this case would be the fastest since it involves the least
-amount of setup (compared to say, Pollard's or Lenstra's)
-
+This step involves factoring z+n, which looks like a recursive problem. But
+we never factor a z+n that is not B-smooth: sieve_logs (below) finds the z for
+which both z and z+n are very likely B-smooth, and only those are factored,
+with factor_over. Trial division over the factor base is enough for them, so
+we are not making a circular argument.
 """
-def build_relations(n , B):
+"""
+Trying every z in range(2 , n) and factoring both z and z+n is far too slow.
+Instead, we sieve a block of consecutive z at a time, as in the Sieve of
+Eratosthenes:
+
+    1. For every prime power p**k with p in the factor base, add log2(p) to
+       every z in the block that it divides, and likewise for z+n. A B-smooth
+       number ends up with (about) its own log2.
+    2. Only the z for which both sums are close enough to log2(z) and
+       log2(z+n) are factored, by trial division over the factor base.
+    3. We stop as soon as we have pi(B) + margin relations: one more than the
+       number of primes guarantees a dependency in the fourth step, and
+       every extra relation adds another one.
+"""
+from math import gcd , log2
+from itertools import compress
+
+def factor_over(number , factor_base):
+    #returns the prime factors of number if it is B-smooth, None otherwise
+    factors = {}
+    for prime in factor_base:
+        if number % prime == 0:
+            factors[prime] = 0
+            while number % prime == 0:
+                factors[prime] = factors[prime] + 1
+                number = number // prime
+    if number != 1:
+        return None
+    return factors
+
+def sieve_logs(start , size , offset , factor_base , logs):
+    #(rounded) log2 of the B-smooth part of start + offset + i, for i in range(size)
+    sieve = bytearray(size)
+    largest = start + offset + size
+    for prime in factor_base:
+        log_p = logs[prime]
+        power = prime
+        while power < largest:
+            for i in range((-(start + offset)) % power , size , power):
+                sieve[i] = sieve[i] + log_p
+            power = power * prime
+    return sieve
+
+def build_relations(n , B , margin = 10 , block_size = 65536):
+    factor_base = primes_up_to(B)
+    logs = {prime : round(log2(prime)) for prime in factor_base}
     relations = []
-    for i in range(2,n):
-        z_factors = prime_factors(i)
-        if is_B_smooth(z_factors , B):
-            zn_factors = prime_factors(n+i)
-            if is_B_smooth(zn_factors , B):
-                relations.append({"z": z_factors, "zn": zn_factors})
+    start = 2
+    
+    while len(relations) < len(factor_base) + margin and start < n:
+        size = min(block_size , n - start)
+        z_sieve = sieve_logs(start , size , 0 , factor_base , logs)
+        zn_sieve = sieve_logs(start , size , n , factor_base , logs)
+        
+        #a value that is not B-smooth misses at least the log of a prime > B,
+        #far more than the rounding errors of the logs
+        z_threshold = min(max(int(log2(start) - log2(B)) , 0) , 255)
+        zn_threshold = min(max(int(log2(start + n) - log2(B)) , 0) , 255)
+        z_mask = z_sieve.translate(bytes([0]*z_threshold + [1]*(256 - z_threshold)))
+        zn_mask = zn_sieve.translate(bytes([0]*zn_threshold + [1]*(256 - zn_threshold)))
+        both = (int.from_bytes(z_mask , 'big') & int.from_bytes(zn_mask , 'big')).to_bytes(size , 'big')
+        
+        for i in compress(range(size) , both):
+            z_factors = factor_over(start + i , factor_base)
+            if z_factors is None:
+                continue
+            zn_factors = factor_over(start + i + n , factor_base)
+            if zn_factors is None:
+                continue
+            relations.append({"z": z_factors, "zn": zn_factors})
+            if len(relations) >= len(factor_base) + margin:
+                break
+        
+        start = start + size
     
     return relations
+
 """
 In the fourth step, we make use of the fact that Rational Sieve attempts to
 obtain squares that are congruent mod n.
@@ -169,85 +179,96 @@ def prime_multiply(n_factors , m_factors):
 
 """
 The final step is to put all these together into the Rational Sieve algorithm.
+
+Since z = z+n (mod n), every relation says
+    product of p**(exponent in z+n - exponent in z) = 1 (mod n)
+(if a prime of the factor base divides n, we are already done). Multiplying
+relations together adds up these exponents, and if all of them are even,
+    x = product of p**((exponent in z+n - exponent in z)/2)
+satisfies x**2 = 1 (mod n), so gcd(x-1 , n) or gcd(x+1 , n) may be a factor.
+
+Trying every subset of relations takes exponential time. Instead, we write
+every relation as a vector of exponents mod 2, with one entry for each prime
+of the factor base (the exponents in z and in z+n add up: a - b and a + b have
+the same parity). A set of relations with even exponents everywhere is
+exactly a set of vectors that add up to 0 over GF(2): a dependency, which
+Gaussian elimination finds in polynomial time (see gf2_linear_algebra.py,
+shared with the Quadratic Sieve).
 """
-import itertools
-#import math #already imported above
+from gf2_linear_algebra import find_dependencies
 
+def parity_columns(relations , factor_base):
+    index = {}
+    for i in range(len(factor_base)):
+        index[factor_base[i]] = i
+    
+    columns = []
+    for relation in relations:
+        product = prime_multiply(relation['z'] , relation['zn'])
+        row = []
+        for prime in product:
+            if product[prime] % 2 == 1:
+                row.append(index[prime])
+        columns.append(sorted(row))
+    return columns
 
 def rational_sieve(n , B):
+    factor_base = primes_up_to(B)
+    for prime in factor_base:
+        if n % prime == 0 and prime != n:
+            return prime
+    
     relations = build_relations(n , B)
-    for L in range(1 , len(relations)+1):
-        for subset in itertools.combinations(relations , L):
-            if L == 1:
-                current_relation = [subset[0]['z'] , subset[0]['zn']]
-                
-            else:
-                current_relation = [subset[0]['z'] , subset[0]['zn']]
-                subset_length = len(subset)
-                for J in range(1 , subset_length):
-                    current_relation[0] = prime_multiply(current_relation[0] , subset[J]['z']  )
-                    current_relation[1] = prime_multiply(current_relation[1] , subset[J]['zn'] )
-            if is_even(current_relation[0]) and is_even(current_relation[1]):
-                x = 1
-                y = 1
-                for prime in current_relation[0]:
-                    x = x * (prime**(current_relation[0][prime]//2))
-                for prime in current_relation[1]:
-                    y = y * (prime**(current_relation[1][prime]//2))
-                
-                    
-                p = math.gcd(x-y , n)
-                if p != 1 and p != n:
-                    return p
-                
-                p = math.gcd(x+y , n)
-                if p != 1 and p != n:
-                    return p
+    dependencies = find_dependencies(parity_columns(relations , factor_base))
+    
+    for dependency in dependencies:
+        current_relation = [{} , {}]
+        for item in dependency:
+            current_relation[0] = prime_multiply(current_relation[0] , relations[item]['z'] )
+            current_relation[1] = prime_multiply(current_relation[1] , relations[item]['zn'])
+        
+        exponents = dict(current_relation[1])
+        for prime in current_relation[0]:
+            exponents[prime] = exponents.get(prime , 0) - current_relation[0][prime]
+        assert is_even(exponents)
+        
+        x = 1
+        for prime in exponents:
+            x = (x * pow(prime , exponents[prime]//2 , n)) % n
+        
+        p = gcd(x-1 , n)
+        if p != 1 and p != n:
+            return p
+        
+        p = gcd(x+1 , n)
+        if p != 1 and p != n:
+            return p
 
 """
 as with any good algorithm implementation, we must craft some test cases:
 """
-test_1 = 2993 # 41*73
-bound_1 = 20
-print(rational_sieve(test_1,bound_1))
-
-import time
-
-st = time.time()
-test_2 = 72781  # 73*997
-bound_2 = 500
-
-st = time.time()
-print(rational_sieve(test_2,bound_2))
-et = time.time()
-
-print(et-st)
-    
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+if __name__ == '__main__':
+    test_1 = 2993 # 41*73
+    bound_1 = 20
+    print(rational_sieve(test_1,bound_1))
 
+    import time
 
+    st = time.time()
+    test_2 = 72781  # 73*997
+    bound_2 = 500
 
+    st = time.time()
+    print(rational_sieve(test_2,bound_2))
+    et = time.time()
 
+    print(et-st)
 
+    test_3 = 998244359987710471  # 1000000007*998244353
+    bound_3 = 20000
 
+    st = time.time()
+    print(rational_sieve(test_3,bound_3))
+    et = time.time()
 
+    print(et-st)
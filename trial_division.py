@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 17:25:12 2026
+
+@author: Zhao Yufan
+"""
+"""
+Problem:
+    "Given an integer n, remove all its prime factors up to a limit."
+
+naive_factorize.py tries every integer up to sqrt(n), including all the even
+ones. It remains in the repository as the baseline to compare against. Here:
+
+    1. Trial division by the primes in a precomputed table (the primes up to
+       'table_limit', from prime_sieve.py).
+
+    2. Beyond the table, we do not sieve further. Instead we divide by the
+       numbers that are coprime to 2*3*5*7 = 210 (the 'wheel'): only 48 out
+       of every 210 numbers, and every prime is among them.
+
+    3. We stop at the limit, or as soon as p*p > cofactor. In the second case
+       the cofactor has no prime factor below p, so it is 1 or prime, and
+       the factorization is complete.
+
+    4. For a batch of numbers, let P be the product of the primes up to the
+       limit. A single remainder tree (product_tree.py) over the batch gives
+       P mod n for every n, and gcd(P mod n , n) is the product of the
+       distinct primes up to the limit dividing n. Only this (usually small)
+       gcd is trial divided.
+
+The square root is always math.isqrt: floating point math.sqrt is wrong for
+n above 2**53.
+
+SPECIFICATIONS:
+    trial_division(n , limit = None) -> ({prime : exponent} , cofactor)
+    trial_division_batch(numbers , limit = 2**16) -> list of ({prime : exponent} , cofactor)
+    (limit = None means sqrt(n), i.e. the complete factorization)
+"""
+from math import gcd , isqrt
+from prime_sieve import primes_up_to
+from product_tree import product , product_tree , remainder_tree
+
+table_limit = 2**16
+prime_table = primes_up_to(table_limit)
+
+wheel_modulus = 2*3*5*7
+wheel_residues = [r for r in range(1 , wheel_modulus) if gcd(r , wheel_modulus) == 1]
+
+def wheel(start):
+    #the numbers >= start coprime to 210, in increasing order
+    base = start - start % wheel_modulus
+    while True:
+        for residue in wheel_residues:
+            if base + residue >= start:
+                yield base + residue
+        base = base + wheel_modulus
+
+def candidates():
+    #every prime, in increasing order (and some composites beyond the table)
+    for prime in prime_table:
+        yield prime
+    for candidate in wheel(table_limit + 1):
+        yield candidate
+
+def trial_division(n , limit = None):
+    assert n > 0 , 'n must be a positive integer'
+    if limit is None:
+        limit = isqrt(n)
+
+    factors = {}
+    cofactor = n
+    for p in candidates():
+        if p > limit or p*p > cofactor:
+            break
+        while cofactor % p == 0:
+            factors[p] = factors.get(p , 0) + 1
+            cofactor = cofactor // p
+
+    #no prime factor below p is left, so a cofactor below p**2 is prime
+    if cofactor > 1 and p*p > cofactor:
+        factors[cofactor] = factors.get(cofactor , 0) + 1
+        cofactor = 1
+    return dict(sorted(factors.items())) , cofactor
+
+def trial_division_batch(numbers , limit = 2**16):
+    numbers = list(numbers)
+    if numbers == []:
+        return []
+    remainders = remainder_tree(product(primes_up_to(limit)) , product_tree(numbers))
+
+    results = []
+    for n , remainder in zip(numbers , remainders):
+        assert n > 0 , 'n must be a positive integer'
+        #the distinct primes up to the limit dividing n
+        primes , _ = trial_division(gcd(remainder , n))
+
+        factors = {}
+        cofactor = n
+        for p in primes:
+            while cofactor % p == 0:
+                factors[p] = factors.get(p , 0) + 1
+                cofactor = cofactor // p
+
+        if cofactor > 1 and (limit + 1)**2 > cofactor:
+            factors[cofactor] = 1
+            cofactor = 1
+        results.append((dict(sorted(factors.items())) , cofactor))
+    return results